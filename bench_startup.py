@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Startup benchmark for the CBZ to PDF Converter.
+
+Measures, in fresh processes:
+- time to first window: launching the GUI until its first window is drawn
+- time to first conversion: launching the command line converter until a
+  small generated CBZ has been converted
+
+Usage:
+    python bench_startup.py [--runs N] [--exe PATH]
+                            [--window-budget MS] [--conversion-budget MS]
+
+Exits with status 1 if a median exceeds its budget, so it can be used to catch
+startup-time regressions.
+"""
+
+import os
+import sys
+import io
+import time
+import zipfile
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(PROJECT_ROOT, "python_app")
+
+# Modules that must not be imported before the first conversion starts
+HEAVY_MODULES = ["PIL", "PyPDF2", "rarfile", "tqdm"]
+
+def _time_command(cmd, cwd, env=None):
+    """Run a command and return its wall time in milliseconds."""
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+def _make_sample_cbz(path, pages=3):
+    """Create a small CBZ with JPEG pages."""
+    from PIL import Image
+    
+    with zipfile.ZipFile(path, 'w') as zip_ref:
+        for index in range(1, pages + 1):
+            buffer = io.BytesIO()
+            Image.new('RGB', (800, 1200), (index * 40, 80, 120)).save(buffer, 'JPEG')
+            zip_ref.writestr(f"page{index}.jpg", buffer.getvalue())
+
+def heavy_modules_at_startup(work_dir):
+    """Return the heavy modules loaded by importing the GUI module."""
+    code = (
+        f"import sys; sys.path.insert(0, {APP_DIR!r}); import main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=work_dir,
+                            capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(',') if m]
+
+def time_to_first_window(work_dir, exe=None):
+    """Launch the GUI and time how long until its first window is drawn."""
+    cmd = [exe] if exe else [sys.executable, os.path.join(APP_DIR, "main.py")]
+    env = dict(os.environ, CBZ2PDF_STARTUP_PROBE="1")
+    return _time_command(cmd, work_dir, env)
+
+def time_to_first_conversion(work_dir, sample_cbz):
+    """Launch the command line converter and time one small conversion."""
+    cmd = [sys.executable, os.path.join(APP_DIR, "converter.py"),
+           "convert", sample_cbz, "-o", work_dir]
+    return _time_command(cmd, work_dir)
+
+def _report(name, samples, budget):
+    """Print the median of the samples and return whether it is within budget."""
+    median = statistics.median(samples)
+    line = f"{name}: median {median:.0f} ms (min {min(samples):.0f}, max {max(samples):.0f}, runs {len(samples)})"
+    if budget is not None:
+        line += f", budget {budget} ms"
+    print(line)
+    return budget is None or median <= budget
+
+def main():
+    """Main benchmark function."""
+    parser = argparse.ArgumentParser(description="Measure converter startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--exe", help="time the first window of a built executable instead of main.py")
+    parser.add_argument("--window-budget", type=float, help="maximum median time to first window (ms)")
+    parser.add_argument("--conversion-budget", type=float, help="maximum median time to first conversion (ms)")
+    parser.add_argument("--skip-window", action="store_true", help="skip the GUI measurement (e.g. without a display)")
+    args = parser.parse_args()
+    
+    within_budget = True
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        heavy = heavy_modules_at_startup(work_dir)
+        if heavy:
+            print(f"Heavy modules imported at startup: {', '.join(heavy)}")
+            within_budget = False
+        else:
+            print("Heavy modules imported at startup: none")
+        
+        if not args.skip_window:
+            try:
+                samples = [time_to_first_window(work_dir, args.exe) for _ in range(args.runs)]
+                within_budget &= _report("Time to first window", samples, args.window_budget)
+            except subprocess.CalledProcessError as e:
+                print(f"Time to first window: failed ({e}); use --skip-window without a display")
+                within_budget = False
+        
+        sample_cbz = os.path.join(work_dir, "sample.cbz")
+        _make_sample_cbz(sample_cbz)
+        samples = [time_to_first_conversion(work_dir, sample_cbz) for _ in range(args.runs)]
+        within_budget &= _report("Time to first conversion", samples, args.conversion_budget)
+    
+    return 0 if within_budget else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 """
 Build script for creating an executable from the Python application.
+
+Usage:
+    python build_exe.py           # one-file build with all dependencies bundled
+    python build_exe.py --slim    # smaller one-directory build that starts faster
 """
 
 import os
@@ -9,9 +13,24 @@ import subprocess
 import shutil
 import platform
 
+# Modules the application never uses; excluded from the slim build
+SLIM_EXCLUDED_MODULES = [
+    "tqdm",
+    "numpy",
+    "PIL.ImageQt",
+    "PIL.ImageTk",
+    "PIL._tkinter_finder",
+    "PIL._imagingtk",
+    "unittest",
+    "pydoc",
+]
+
 def main():
     """Main build function."""
-    print("Building CBZ to PDF Converter executable...")
+    # The slim variant skips --collect-all and builds a one-directory bundle,
+    # so a launch does not have to unpack the whole bundle to a temp directory
+    slim = "--slim" in sys.argv[1:]
+    print(f"Building CBZ to PDF Converter executable{' (slim)' if slim else ''}...")
     
     # Ensure we're in the project root directory
     project_root = os.path.dirname(os.path.abspath(__file__))
@@ -41,7 +60,6 @@ def main():
             "PIL._tkinter_finder",
             "PIL._imagingtk",
             "rarfile",
-            "tqdm",
             "tkinter",
             "tkinter.filedialog",
             "tkinter.ttk",
@@ -89,17 +107,30 @@ def main():
         
         # 创建spec文件
         print("Creating spec file...")
-        spec_cmd = [
-            "pyi-makespec",
-            "--onefile",
-            "--windowed",
-            "--name", "CBZtoPDFConverter",
-            "--hidden-import", hidden_imports_str,
-            "--collect-all", "PyPDF2",
-            "--collect-all", "PIL",
-            "--collect-all", "rarfile",
-            os.path.join("python_app", "main.py")
-        ]
+        if slim:
+            # PyInstaller's analysis follows the function-level imports in
+            # converter.py and its hooks collect what PIL/PyPDF2/rarfile need
+            spec_cmd = [
+                "pyi-makespec",
+                "--onedir",
+                "--windowed",
+                "--name", "CBZtoPDFConverter",
+            ]
+            for module in SLIM_EXCLUDED_MODULES:
+                spec_cmd += ["--exclude-module", module]
+            spec_cmd.append(os.path.join("python_app", "main.py"))
+        else:
+            spec_cmd = [
+                "pyi-makespec",
+                "--onefile",
+                "--windowed",
+                "--name", "CBZtoPDFConverter",
+                "--hidden-import", hidden_imports_str,
+                "--collect-all", "PyPDF2",
+                "--collect-all", "PIL",
+                "--collect-all", "rarfile",
+                os.path.join("python_app", "main.py")
+            ]
         
         subprocess.run(spec_cmd, check=True)
         
@@ -1,11 +1,23 @@
 import os
+import io
+import re
+import glob
 import zipfile
 import tempfile
 import shutil
-from PIL import Image
-from PyPDF2 import PdfWriter, PdfReader
-import rarfile
-from tqdm import tqdm
+import time
+import hashlib
+import json
+import zlib
+import uuid
+import socket
+import threading
+import argparse
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+# PIL, PyPDF2 and rarfile are imported on first use so that importing this
+# module (and starting the GUI) stays fast; rarfile is only loaded for CBR
 import logging
 import sys
 import traceback
@@ -24,6 +36,359 @@ try:
 except Exception as e:
     print(f"无法设置日志文件: {e}")
 
+# Default bounding box for cover thumbnails written to the cache
+DEFAULT_THUMBNAIL_SIZE = (256, 256)
+# Default upper bound for the total size of the thumbnail cache directory
+DEFAULT_THUMBNAIL_CACHE_BYTES = 512 * 1024 * 1024
+# Bounding box for /Thumb entries embedded in generated PDFs
+PDF_THUMBNAIL_SIZE = (106, 106)
+# Pixels per inch used to size PDF pages from image dimensions
+PDF_RESOLUTION = 100.0
+# Relative seconds per byte of each conversion stage, used to estimate the
+# remaining time of a stage before it has reported any progress of its own
+PROGRESS_STAGE_COSTS = {'extract': 1.0, 'pdf': 20.0, 'write': 1.0}
+# Seconds a work queue lease stays valid without a heartbeat
+DEFAULT_LEASE_TTL = 60.0
+# Seconds between lease renewals while a job is running
+DEFAULT_HEARTBEAT_INTERVAL = 15.0
+# Number of archive members checked by one validation task
+VALIDATION_CHUNK_SIZE = 16
+# Default target codec and quality of the archive optimize mode
+DEFAULT_OPTIMIZE_FORMAT = 'webp'
+DEFAULT_OPTIMIZE_QUALITY = 80
+# File extension written for each optimize target codec
+OPTIMIZE_EXTENSIONS = {'webp': '.webp', 'jpeg': '.jpg'}
+# Leading bytes of each supported image format
+IMAGE_SIGNATURES = {
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.png': (b'\x89PNG\r\n\x1a\n',),
+    '.gif': (b'GIF87a', b'GIF89a'),
+    '.bmp': (b'BM',),
+    '.webp': (b'RIFF',),
+    '.jp2': (b'\x00\x00\x00\x0cjP  \r\n\x87\n',),
+    '.j2k': (b'\xff\x4f\xff\x51',),
+}
+
+class ConversionCancelled(Exception):
+    """Raised inside the converter when its CancellationToken is cancelled."""
+
+class CancellationToken:
+    """
+    A thread-safe flag used to stop a running conversion.
+    
+    The converter checks the token between archive members and between pages,
+    so a cancel takes effect within the processing time of a single page.
+    """
+    
+    def __init__(self):
+        """Initialize an uncancelled token."""
+        self._event = threading.Event()
+    
+    def cancel(self):
+        """Request cancellation."""
+        self._event.set()
+    
+    @property
+    def cancelled(self):
+        """Whether cancellation has been requested."""
+        return self._event.is_set()
+    
+    def raise_if_cancelled(self):
+        """Raise ConversionCancelled if cancellation has been requested."""
+        if self._event.is_set():
+            raise ConversionCancelled()
+
+class ProgressTracker:
+    """
+    Turn per-member and per-page events into progress reports with an ETA.
+    
+    The callback receives a dict with the keys input_path, stage ('extract',
+    'pdf' or 'write'), current, total, item, bytes_done, bytes_total,
+    fraction, elapsed and eta (seconds, or None until there is a throughput
+    sample).
+    
+    Stages run at very different speeds (extracting a member is much faster
+    than encoding it as a page), so throughput is measured per stage. A stage
+    that has not reported yet is estimated from a measured stage, scaled by
+    PROGRESS_STAGE_COSTS.
+    """
+    
+    def __init__(self, callback, input_path):
+        """Initialize the tracker."""
+        self.callback = callback
+        self.input_path = input_path
+        self.stage_totals = {}
+        self.stage_done = {}
+        self.stage_seconds = {}
+        self.start_time = time.monotonic()
+        self._last_time = self.start_time
+    
+    @property
+    def bytes_total(self):
+        """Total bytes of work over all stages."""
+        return sum(self.stage_totals.values())
+    
+    @property
+    def bytes_done(self):
+        """Bytes of work finished over all stages."""
+        return sum(self.stage_done.values())
+    
+    def add_total(self, stage, num_bytes):
+        """Add bytes of work that a stage will report later."""
+        self.stage_totals[stage] = self.stage_totals.get(stage, 0) + num_bytes
+    
+    def _estimate_remaining(self):
+        """Return the estimated seconds left, or None without a throughput sample."""
+        # Seconds per byte of every stage that has reported progress
+        measured = {stage: self.stage_seconds[stage] / done
+                    for stage, done in self.stage_done.items()
+                    if done > 0 and self.stage_seconds.get(stage, 0) > 0}
+        if not measured:
+            return None
+        
+        # Use the stage with the longest sample to scale the unmeasured ones
+        reference = max(measured, key=lambda stage: self.stage_seconds[stage])
+        reference_cost = PROGRESS_STAGE_COSTS.get(reference, 1.0)
+        
+        remaining = 0.0
+        for stage, total in self.stage_totals.items():
+            left = max(total - self.stage_done.get(stage, 0), 0)
+            if stage in measured:
+                seconds_per_byte = measured[stage]
+            else:
+                seconds_per_byte = (measured[reference] * PROGRESS_STAGE_COSTS.get(stage, 1.0)
+                                    / reference_cost)
+            remaining += left * seconds_per_byte
+        return remaining
+    
+    def advance(self, stage, current, total, item, num_bytes):
+        """Record a finished member or page and report progress."""
+        now = time.monotonic()
+        # The time since the previous event was spent on this item
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0) + now - self._last_time
+        self.stage_done[stage] = self.stage_done.get(stage, 0) + num_bytes
+        self._last_time = now
+        elapsed = now - self.start_time
+        
+        eta = self._estimate_remaining()
+        bytes_total = self.bytes_total
+        bytes_done = self.bytes_done
+        fraction = bytes_done / bytes_total if bytes_total else 0.0
+        try:
+            self.callback({
+                'input_path': self.input_path,
+                'stage': stage,
+                'current': current,
+                'total': total,
+                'item': item,
+                'bytes_done': bytes_done,
+                'bytes_total': bytes_total,
+                'fraction': min(fraction, 1.0),
+                'elapsed': elapsed,
+                'eta': eta,
+            })
+        except Exception as e:
+            logger.warning(f"进度回调出错: {e}")
+
+class _StreamingPdfWriter:
+    """
+    Write a PDF object by object straight to a file.
+    
+    Only the byte offsets of written objects and the page object numbers are
+    kept in memory, so memory use does not grow with the size of the images.
+    Object 1 is the catalog and object 2 the page tree; both are written last.
+    """
+    
+    def __init__(self, f):
+        """Initialize the writer and write the PDF header."""
+        self.f = f
+        self.offsets = {}
+        self.next_number = 3
+        self.page_numbers = []
+        self.outline = []
+        self._pending_title = None
+        self._copied = {}
+        # 1.5 is the first version with JPXDecode, which JPEG 2000 pages use
+        f.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    
+    def _allocate(self):
+        """Reserve the next object number."""
+        number = self.next_number
+        self.next_number += 1
+        return number
+    
+    def _write_object(self, number, body):
+        """Write an object body (bytes) under a reserved number."""
+        self.offsets[number] = self.f.tell()
+        self.f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    
+    def _write_stream(self, number, entries, data):
+        """Write a stream object; entries is the dictionary body without /Length."""
+        self._write_object(number, b"<<" + entries + b" /Length %d>>\nstream\n" % len(data)
+                           + data + b"\nendstream")
+    
+    def begin_volume(self, title):
+        """Start a volume; its outline entry points at its first written page."""
+        self._pending_title = title
+        # Object numbers of copied PDF objects are only valid within one source file
+        self._copied = {}
+    
+    def _add_page(self, body):
+        """Write a page object and record it in the page tree and outline."""
+        number = self._allocate()
+        self._write_object(number, b"<</Type /Page /Parent 2 0 R " + body + b">>")
+        self.page_numbers.append(number)
+        if self._pending_title is not None:
+            self.outline.append((self._pending_title, number))
+            self._pending_title = None
+    
+    def add_image_page(self, width, height, page_width, page_height, entries, data):
+        """
+        Add a page showing one image stream across the whole page.
+        
+        Args:
+            width, height (int): Image size in pixels.
+            page_width, page_height (float): Page size in points.
+            entries (bytes): /ColorSpace, /BitsPerComponent, /Filter and
+                optionally /Decode entries of the image dictionary.
+            data (bytes): The encoded image stream, written unchanged.
+        """
+        image_number = self._allocate()
+        self._write_stream(image_number, b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+                           % (width, height) + entries, data)
+        
+        content_number = self._allocate()
+        page_size = (_pdf_number(page_width), _pdf_number(page_height))
+        self._write_stream(content_number, b"", b"q %s 0 0 %s 0 0 cm /Im0 Do Q" % page_size)
+        
+        self._add_page(b"/MediaBox [0 0 %s %s] " % page_size
+                       + b"/Resources <</XObject <</Im0 %d 0 R>> /ProcSet [/PDF /ImageB /ImageC]>> "
+                       % image_number + b"/Contents %d 0 R" % content_number)
+    
+    def add_copied_page(self, page):
+        """Add a page from a PdfReader, copying its streams byte for byte."""
+        body = b""
+        for key in ('/Resources', '/MediaBox', '/CropBox', '/Rotate'):
+            value = _get_inherited_page_value(page, key)
+            if value is not None:
+                body += key.encode('ascii') + b" " + self._serialize(value) + b" "
+        if '/Contents' in page:
+            body += b"/Contents " + self._serialize(page.raw_get('/Contents'))
+        self._add_page(body)
+    
+    def _serialize(self, obj):
+        """Serialize a PyPDF2 object, copying the objects it references."""
+        from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject
+        
+        if isinstance(obj, IndirectObject):
+            return b"%d 0 R" % self._copy_indirect(obj)
+        if isinstance(obj, DictionaryObject):
+            return b"<<" + b" ".join(self._serialize(key) + b" " + self._serialize(value)
+                                     for key, value in obj.items()) + b">>"
+        if isinstance(obj, ArrayObject):
+            return b"[" + b" ".join(self._serialize(value) for value in obj) + b"]"
+        
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer, None)
+        return buffer.getvalue()
+    
+    def _copy_indirect(self, reference):
+        """Copy a referenced object once per volume and return its new number."""
+        from PyPDF2.generic import StreamObject
+        
+        key = (reference.idnum, reference.generation)
+        if key in self._copied:
+            return self._copied[key]
+        
+        # Reserve the number first so reference cycles terminate
+        number = self._allocate()
+        self._copied[key] = number
+        
+        obj = reference.get_object()
+        if isinstance(obj, StreamObject):
+            entries = b" ".join(self._serialize(name) + b" " + self._serialize(value)
+                                for name, value in obj.items() if name != '/Length')
+            self._write_stream(number, entries, obj._data)
+        else:
+            self._write_object(number, self._serialize(obj))
+        return number
+    
+    def close(self):
+        """Write the page tree, outline, catalog, cross-reference table and trailer."""
+        from PyPDF2.generic import TextStringObject
+        
+        kids = b" ".join(b"%d 0 R" % number for number in self.page_numbers)
+        self._write_object(2, b"<</Type /Pages /Kids [%s] /Count %d>>" % (kids, len(self.page_numbers)))
+        
+        catalog = b"<</Type /Catalog /Pages 2 0 R"
+        if self.outline:
+            outlines_number = self._allocate()
+            item_numbers = [self._allocate() for _ in self.outline]
+            for index, (title, page_number) in enumerate(self.outline):
+                buffer = io.BytesIO()
+                TextStringObject(title).write_to_stream(buffer, None)
+                item = b"<</Title %s /Parent %d 0 R /Dest [%d 0 R /Fit]" % (
+                    buffer.getvalue(), outlines_number, page_number)
+                if index > 0:
+                    item += b" /Prev %d 0 R" % item_numbers[index - 1]
+                if index < len(item_numbers) - 1:
+                    item += b" /Next %d 0 R" % item_numbers[index + 1]
+                self._write_object(item_numbers[index], item + b">>")
+            self._write_object(outlines_number, b"<</Type /Outlines /First %d 0 R /Last %d 0 R /Count %d>>"
+                               % (item_numbers[0], item_numbers[-1], len(item_numbers)))
+            catalog += b" /Outlines %d 0 R /PageMode /UseOutlines" % outlines_number
+        self._write_object(1, catalog + b">>")
+        
+        xref_offset = self.f.tell()
+        self.f.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_number)
+        for number in range(1, self.next_number):
+            self.f.write(b"%010d 00000 n \n" % self.offsets[number])
+        self.f.write(b"trailer\n<</Size %d /Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n"
+                     % (self.next_number, xref_offset))
+
+def _make_partial_path(output_path):
+    """
+    Return a unique .part path next to an output to write it under.
+    
+    Jobs whose outputs collide then never write to or delete each other's
+    partial file; the last one to finish wins the final rename.
+    """
+    return f"{output_path}.{uuid.uuid4().hex[:12]}.part"
+
+def _pdf_number(value):
+    """Format a number for a PDF content stream or dictionary."""
+    return (b"%.4f" % value).rstrip(b"0").rstrip(b".")
+
+def _iter_pdf_pages(input_path):
+    """
+    Yield (index, total, page) for the pages of a PDF, one page at a time.
+    
+    Objects PdfReader cached for a page are dropped once the caller moves on,
+    so memory use stays flat for long PDFs. Raises ValueError for encrypted PDFs.
+    """
+    from PyPDF2 import PdfReader
+    
+    # Pass an open file so PdfReader does not load the whole PDF into memory
+    with open(input_path, 'rb') as f:
+        reader = PdfReader(f)
+        if reader.is_encrypted:
+            raise ValueError(f"不支持加密的PDF: {input_path}")
+        
+        total_pages = len(reader.pages)
+        for index, page in enumerate(reader.pages, 1):
+            yield index, total_pages, page
+            reader.resolved_objects.clear()
+
+def _get_inherited_page_value(page, key):
+    """Get a raw page attribute, following /Parent for inheritable ones."""
+    node = page
+    while node is not None:
+        if key in node:
+            return node.raw_get(key)
+        node = node['/Parent'] if '/Parent' in node else None
+    return None
+
 class CBZtoPDFConverter:
     """
     A class to convert CBZ (Comic Book ZIP) files to PDF format.
@@ -31,7 +396,7 @@ class CBZtoPDFConverter:
     
     def __init__(self):
         """Initialize the converter."""
-        self.supported_image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+        self.supported_image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.jp2', '.j2k']
         self.temp_dir = None
     
     def _create_temp_dir(self):
@@ -45,7 +410,7 @@ class CBZtoPDFConverter:
             shutil.rmtree(self.temp_dir)
             self.temp_dir = None
     
-    def _extract_cbz(self, cbz_path, extract_dir):
+    def _extract_cbz(self, cbz_path, extract_dir, progress=None, cancel_token=None):
         """Extract the CBZ file to the specified directory."""
         try:
             with zipfile.ZipFile(cbz_path, 'r') as zip_ref:
@@ -55,6 +420,8 @@ class CBZtoPDFConverter:
                 
                 # Extract all files
                 for index, file in enumerate(file_list, 1):
+                    if cancel_token:
+                        cancel_token.raise_if_cancelled()
                     logger.info(f"正在解压文件 {index}/{total_files}: {file}")
                     # 获取目标文件的完整路径
                     target_path = os.path.join(extract_dir, file)
@@ -63,17 +430,23 @@ class CBZtoPDFConverter:
                     # 解压文件
                     with zip_ref.open(file) as source, open(target_path, 'wb') as target:
                         shutil.copyfileobj(source, target)
+                    if progress:
+                        progress.advance('extract', index, total_files, file, zip_ref.getinfo(file).file_size)
                 
             logger.info(f"Successfully extracted {cbz_path}")
             return True
+        except ConversionCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error extracting CBZ file: {e}")
             logger.error(traceback.format_exc())
             return False
     
-    def _extract_cbr(self, cbr_path, extract_dir):
+    def _extract_cbr(self, cbr_path, extract_dir, progress=None, cancel_token=None):
         """Extract the CBR file to the specified directory."""
         try:
+            import rarfile
+            
             with rarfile.RarFile(cbr_path, 'r') as rar_ref:
                 # Get list of files in the archive
                 file_list = [f for f in rar_ref.namelist() if not f.endswith('/')]
@@ -81,6 +454,8 @@ class CBZtoPDFConverter:
                 
                 # Extract all files
                 for index, file in enumerate(file_list, 1):
+                    if cancel_token:
+                        cancel_token.raise_if_cancelled()
                     logger.info(f"正在解压文件 {index}/{total_files}: {file}")
                     # 获取目标文件的完整路径
                     target_path = os.path.join(extract_dir, file)
@@ -89,9 +464,13 @@ class CBZtoPDFConverter:
                     # 解压文件
                     with rar_ref.open(file) as source, open(target_path, 'wb') as target:
                         shutil.copyfileobj(source, target)
+                    if progress:
+                        progress.advance('extract', index, total_files, file, rar_ref.getinfo(file).file_size)
                 
             logger.info(f"Successfully extracted {cbr_path}")
             return True
+        except ConversionCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error extracting CBR file: {e}")
             logger.error(traceback.format_exc())
@@ -117,19 +496,151 @@ class CBZtoPDFConverter:
         Return a key for natural sorting.
         For example, ['1', '10', '2'] will be sorted as ['1', '2', '10'].
         """
-        import re
         return [int(text) if text.isdigit() else text.lower()
                 for text in re.split(r'(\d+)', os.path.basename(s))]
     
-    def _create_pdf(self, image_files, output_pdf_path):
-        """Create a PDF from the list of image files."""
+    def _open_archive(self, archive_path):
+        """Open a CBZ/CBR archive for reading without extracting it."""
+        file_ext = os.path.splitext(archive_path)[1].lower()
+        if file_ext == '.cbz':
+            return zipfile.ZipFile(archive_path, 'r')
+        if file_ext == '.cbr':
+            import rarfile
+            return rarfile.RarFile(archive_path, 'r')
+        raise ValueError(f"不支持的文件格式: {file_ext}")
+    
+    def _get_sorted_image_members(self, archive):
+        """Get the image members of an open archive in natural sort order."""
+        image_members = []
+        
+        for name in archive.namelist():
+            if name.endswith('/'):
+                continue
+            if os.path.splitext(name)[1].lower() in self.supported_image_extensions:
+                image_members.append(name)
+        
+        return sorted(image_members, key=self._natural_sort_key)
+    
+    def _read_comicinfo_cover_index(self, archive):
+        """
+        Return the page index marked as FrontCover in ComicInfo.xml.
+        
+        Returns:
+            int or None: Index into the sorted image members, or None if the
+                archive has no ComicInfo.xml or it does not mark a cover.
+        """
+        comicinfo = None
+        for name in archive.namelist():
+            if os.path.basename(name).lower() == 'comicinfo.xml':
+                comicinfo = name
+                break
+        
+        if comicinfo is None:
+            return None
+        
         try:
+            root = ET.fromstring(archive.read(comicinfo))
+            for page in root.iter('Page'):
+                if page.get('Type', '').lower() == 'frontcover':
+                    return int(page.get('Image'))
+        except Exception as e:
+            logger.warning(f"无法解析ComicInfo.xml: {e}")
+        
+        return None
+    
+    def _get_cover_member(self, archive):
+        """Get the name of the cover member of an open archive."""
+        image_members = self._get_sorted_image_members(archive)
+        if not image_members:
+            return None
+        
+        cover_index = self._read_comicinfo_cover_index(archive)
+        if cover_index is not None and 0 <= cover_index < len(image_members):
+            return image_members[cover_index]
+        
+        return image_members[0]
+    
+    def get_cover_image(self, input_path, size=None):
+        """
+        Decode only the cover page of a CBZ/CBR file.
+        
+        The cover is the page marked as FrontCover in ComicInfo.xml, or the
+        first page in natural sort order otherwise. No other member is read.
+        
+        Args:
+            input_path (str): Path to the CBZ/CBR file.
+            size (tuple, optional): (width, height) bounding box. JPEG covers
+                are decoded in draft mode at the smallest scale that still
+                covers this box, then shrunk to fit it.
+        
+        Returns:
+            PIL.Image.Image: The cover image in RGB mode, or None on failure.
+        """
+        try:
+            from PIL import Image
+            
+            with self._open_archive(input_path) as archive:
+                member = self._get_cover_member(archive)
+                if member is None:
+                    logger.error(f"在压缩包中没有找到图片文件: {input_path}")
+                    return None
+                logger.debug(f"封面文件: {member}")
+                data = archive.read(member)
+            
+            img = Image.open(io.BytesIO(data))
+            if size:
+                # Only JPEG supports draft mode; other formats ignore it
+                img.draft('RGB', size)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            if size:
+                img.thumbnail(size)
+            return img
+        except Exception as e:
+            logger.error(f"提取封面时出错 {input_path}: {e}")
+            logger.error(traceback.format_exc())
+            return None
+    
+    def _add_page_thumbnail(self, pdf_writer, page, img):
+        """Embed a JPEG /Thumb entry for the page, built from its image."""
+        from PyPDF2.generic import NameObject, NumberObject, StreamObject
+        
+        thumb = img.copy()
+        thumb.thumbnail(PDF_THUMBNAIL_SIZE)
+        buffer = io.BytesIO()
+        thumb.save(buffer, 'JPEG', quality=75)
+        
+        stream = StreamObject()
+        stream._data = buffer.getvalue()
+        stream.update({
+            NameObject('/Width'): NumberObject(thumb.width),
+            NameObject('/Height'): NumberObject(thumb.height),
+            NameObject('/ColorSpace'): NameObject('/DeviceRGB'),
+            NameObject('/BitsPerComponent'): NumberObject(8),
+            NameObject('/Filter'): NameObject('/DCTDecode'),
+        })
+        page[NameObject('/Thumb')] = pdf_writer._add_object(stream)
+    
+    def _create_pdf(self, image_files, output_pdf_path, embed_thumbnails=False,
+                    progress=None, cancel_token=None):
+        """
+        Create a PDF from the list of image files.
+        
+        The PDF is written to a .part file next to the output and renamed into
+        place once complete, so a cancelled or failed run leaves no partial PDF.
+        """
+        try:
+            from PIL import Image
+            from PyPDF2 import PdfWriter, PdfReader
+            
             logger.info(f"开始创建PDF，共 {len(image_files)} 张图片")
             pdf_writer = PdfWriter()
             processed_images = 0
             total_images = len(image_files)
             
             for index, img_path in enumerate(image_files, 1):
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
                 try:
                     logger.info(f"正在处理图片 {index}/{total_images}: {img_path}")
                     img = Image.open(img_path)
@@ -146,14 +657,16 @@ class CBZtoPDFConverter:
                         temp_pdf_path = temp_pdf.name
                     
                     logger.debug(f"保存图片到临时PDF: {temp_pdf_path}")
-                    img.save(temp_pdf_path, 'PDF', resolution=100.0)
+                    img.save(temp_pdf_path, 'PDF', resolution=PDF_RESOLUTION)
                     
                     # Add the page to the PDF writer using PdfReader
                     logger.debug(f"读取临时PDF并添加页面")
                     try:
                         pdf_reader = PdfReader(temp_pdf_path)
                         for page in pdf_reader.pages:
-                            pdf_writer.add_page(page)
+                            added_page = pdf_writer.add_page(page)
+                            if embed_thumbnails:
+                                self._add_page_thumbnail(pdf_writer, added_page, img)
                         processed_images += 1
                     except Exception as reader_error:
                         logger.error(f"读取PDF页面时出错: {reader_error}")
@@ -169,6 +682,9 @@ class CBZtoPDFConverter:
                 except Exception as e:
                     logger.error(f"处理图片时出错 {img_path}: {e}")
                     logger.error(traceback.format_exc())
+                
+                if progress:
+                    progress.advance('pdf', index, total_images, img_path, os.path.getsize(img_path))
             
             logger.info(f"成功处理了 {processed_images}/{len(image_files)} 张图片")
             
@@ -177,28 +693,405 @@ class CBZtoPDFConverter:
                 return False
             
             # Write the final PDF
+            partial_pdf_path = _make_partial_path(output_pdf_path)
             try:
                 logger.info(f"写入最终PDF到: {output_pdf_path}")
-                with open(output_pdf_path, 'wb') as f:
+                with open(partial_pdf_path, 'wb') as f:
                     pdf_writer.write(f)
                 
+                if progress:
+                    write_bytes = sum(os.path.getsize(img_path) for img_path in image_files)
+                    progress.advance('write', 1, 1, output_pdf_path, write_bytes)
+                
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                
                 # 验证PDF文件是否已创建且大小大于0
-                if os.path.exists(output_pdf_path) and os.path.getsize(output_pdf_path) > 0:
+                if os.path.exists(partial_pdf_path) and os.path.getsize(partial_pdf_path) > 0:
+                    os.replace(partial_pdf_path, output_pdf_path)
                     logger.info(f"成功创建PDF，文件大小: {os.path.getsize(output_pdf_path)} 字节")
                     return True
                 else:
                     logger.error(f"PDF文件创建失败或大小为0: {output_pdf_path}")
                     return False
+            except ConversionCancelled:
+                raise
             except Exception as write_error:
                 logger.error(f"写入PDF文件时出错: {write_error}")
                 logger.error(traceback.format_exc())
                 return False
+            finally:
+                if os.path.exists(partial_pdf_path):
+                    os.unlink(partial_pdf_path)
+        except ConversionCancelled:
+            raise
         except Exception as e:
             logger.error(f"创建PDF时出错: {e}")
             logger.error(traceback.format_exc())
             return False
     
-    def convert(self, input_path, output_path=None):
+    def _add_archive_volume(self, writer, input_path):
+        """
+        Add the pages of a CBZ/CBR file to an omnibus without re-encoding JPEGs.
+        
+        JPEG and JPEG 2000 members are written as DCTDecode and JPXDecode
+        streams byte for byte. Other images are stored losslessly as
+        Flate-compressed pixels.
+        
+        Returns:
+            int: Number of pages added.
+        """
+        from PIL import Image
+        
+        pages = 0
+        with self._open_archive(input_path) as archive:
+            image_members = self._get_sorted_image_members(archive)
+            for index, member in enumerate(image_members, 1):
+                try:
+                    logger.debug(f"正在添加图片 {index}/{len(image_members)}: {member}")
+                    data = archive.read(member)
+                    img = Image.open(io.BytesIO(data))
+                    width, height = img.size
+                    page_width = width * 72.0 / PDF_RESOLUTION
+                    page_height = height * 72.0 / PDF_RESOLUTION
+                    
+                    if img.format == 'JPEG' and img.mode in ('L', 'RGB', 'CMYK'):
+                        color_space = {'L': b'/DeviceGray', 'RGB': b'/DeviceRGB', 'CMYK': b'/DeviceCMYK'}[img.mode]
+                        entries = b"/ColorSpace " + color_space + b" /BitsPerComponent 8 /Filter /DCTDecode"
+                        if img.mode == 'CMYK':
+                            # Adobe CMYK JPEGs are stored inverted
+                            entries += b" /Decode [1 0 1 0 1 0 1 0]"
+                    elif img.format == 'JPEG2000':
+                        # JPX data carries its own color space
+                        entries = b"/Filter /JPXDecode"
+                    else:
+                        if img.mode not in ('L', 'RGB'):
+                            img = img.convert('RGB')
+                        color_space = b'/DeviceGray' if img.mode == 'L' else b'/DeviceRGB'
+                        entries = b"/ColorSpace " + color_space + b" /BitsPerComponent 8 /Filter /FlateDecode"
+                        data = zlib.compress(img.tobytes())
+                    
+                    writer.add_image_page(width, height, page_width, page_height, entries, data)
+                    pages += 1
+                except Exception as e:
+                    logger.error(f"处理图片时出错 {member}: {e}")
+                    logger.error(traceback.format_exc())
+        return pages
+    
+    def _add_pdf_volume(self, writer, input_path):
+        """
+        Add the pages of a PDF to an omnibus, copying its streams byte for byte.
+        
+        Returns:
+            int: Number of pages added.
+        """
+        pages = 0
+        for _, _, page in _iter_pdf_pages(input_path):
+            writer.add_copied_page(page)
+            pages += 1
+        return pages
+    
+    def create_omnibus(self, input_paths, output_path, titles=None):
+        """
+        Merge several volumes into one PDF without re-encoding their images.
+        
+        Pages are streamed to the output one at a time, so memory use stays
+        bounded no matter how many volumes there are. Each volume gets an
+        outline (bookmark) entry pointing at its first page.
+        
+        Args:
+            input_paths (list): Ordered paths to CBZ/CBR files or PDFs.
+            output_path (str): Path for the output PDF file.
+            titles (list, optional): Outline titles, one per volume. Defaults
+                to the file names without extension.
+        
+        Returns:
+            bool: True if every volume was added, False otherwise.
+        """
+        if titles is None:
+            titles = [os.path.splitext(os.path.basename(path))[0] for path in input_paths]
+        if len(titles) != len(input_paths):
+            logger.error("卷标题数量与输入文件数量不一致")
+            return False
+        if not input_paths:
+            logger.error("没有输入任何卷，无法创建合集")
+            return False
+        
+        logger.info(f"开始创建合集，共 {len(input_paths)} 卷: {output_path}")
+        partial_pdf_path = output_path + '.part'
+        try:
+            with open(partial_pdf_path, 'wb') as f:
+                writer = _StreamingPdfWriter(f)
+                for index, (input_path, title) in enumerate(zip(input_paths, titles), 1):
+                    logger.info(f"正在添加第 {index}/{len(input_paths)} 卷: {input_path}")
+                    file_ext = os.path.splitext(input_path)[1].lower()
+                    writer.begin_volume(title)
+                    
+                    if file_ext in ('.cbz', '.cbr'):
+                        pages = self._add_archive_volume(writer, input_path)
+                    elif file_ext == '.pdf':
+                        pages = self._add_pdf_volume(writer, input_path)
+                    else:
+                        logger.error(f"不支持的文件格式: {file_ext}")
+                        return False
+                    
+                    if pages == 0:
+                        logger.error(f"没有从该卷添加任何页面: {input_path}")
+                        return False
+                writer.close()
+            
+            os.replace(partial_pdf_path, output_path)
+            logger.info(f"成功创建合集，共 {len(writer.page_numbers)} 页，文件大小: {os.path.getsize(output_path)} 字节")
+            return True
+        except Exception as e:
+            logger.error(f"创建合集时出错: {e}")
+            logger.error(traceback.format_exc())
+            return False
+        finally:
+            if os.path.exists(partial_pdf_path):
+                os.unlink(partial_pdf_path)
+    
+    def _check_image_data(self, member, data):
+        """
+        Check an image's signature, dimensions and ending without decoding it.
+        
+        Returns:
+            str: A description of the problem, or None if the image looks valid.
+        """
+        from PIL import Image
+        
+        file_ext = os.path.splitext(member)[1].lower()
+        if not data.startswith(IMAGE_SIGNATURES[file_ext]):
+            return f"文件头与扩展名{file_ext}不符"
+        
+        # Decoders only need the end of the file to spot truncation
+        tail = data[-4096:]
+        if file_ext in ('.jpg', '.jpeg') and b'\xff\xd9' not in tail:
+            return "缺少JPEG结束标记(EOI)，文件可能被截断"
+        if file_ext == '.png' and b'IEND' not in tail:
+            return "缺少PNG结束块(IEND)，文件可能被截断"
+        if file_ext == '.gif' and not data.rstrip(b'\x00').endswith(b';'):
+            return "缺少GIF结束符，文件可能被截断"
+        if file_ext == '.webp' and (data[8:12] != b'WEBP'
+                                    or int.from_bytes(data[4:8], 'little') + 8 > len(data)):
+            return "WEBP文件大小与RIFF头不符，文件可能被截断"
+        if file_ext == '.j2k' and not data.endswith(b'\xff\xd9'):
+            return "缺少JPEG 2000结束标记(EOC)，文件可能被截断"
+        if file_ext == '.bmp' and int.from_bytes(data[2:6], 'little') > len(data):
+            return "BMP文件大小与文件头不符，文件可能被截断"
+        
+        # Image.open only parses the header; pixel data is not decoded
+        try:
+            width, height = Image.open(io.BytesIO(data)).size
+        except Exception as e:
+            return f"无法读取图片头: {e}"
+        if width <= 0 or height <= 0:
+            return f"图片尺寸无效: {width}x{height}"
+        
+        return None
+    
+    def _validate_members(self, input_path, members, failed_archives=None, solid=False):
+        """
+        Read members of an archive, verifying their CRCs and image headers.
+        
+        Args:
+            input_path (str): Path to the CBZ/CBR file.
+            members (list): Names of the image members to check.
+            failed_archives (set, optional): Archives already known to be
+                invalid; checking stops early when input_path is among them.
+            solid (bool, optional): The archive is a solid RAR. Its members
+                share one compressed stream, and reading them one at a time
+                decompresses the stream from the start for every member, so
+                they are extracted together in a single pass instead.
+        
+        Returns:
+            list: One {'member', 'error'} dict per invalid member.
+        """
+        errors = []
+        extract_dir = None
+        with self._open_archive(input_path) as archive:
+            read_member = archive.read
+            if solid:
+                extract_dir = tempfile.mkdtemp(prefix="cbz2pdf_validate_")
+                try:
+                    # Extraction verifies the CRC of every member
+                    archive.extractall(extract_dir, members)
+                    
+                    def read_member(member):
+                        with open(os.path.join(extract_dir, member), 'rb') as f:
+                            return f.read()
+                except Exception as e:
+                    # Fall back to reading members one by one to find the bad ones
+                    logger.warning(f"固实压缩包整体解压失败，逐个检查成员 {input_path}: {e}")
+            
+            for member in members:
+                if failed_archives is not None and input_path in failed_archives:
+                    break
+                
+                try:
+                    # Reading a member to the end verifies its CRC
+                    data = read_member(member)
+                    error = self._check_image_data(member, data)
+                except Exception as e:
+                    error = f"读取失败(CRC或数据错误): {type(e).__name__}: {e}"
+                
+                if error:
+                    errors.append({'member': member, 'error': error})
+                    if failed_archives is not None:
+                        failed_archives.add(input_path)
+        
+        if extract_dir:
+            shutil.rmtree(extract_dir, ignore_errors=True)
+        return errors
+    
+    def optimize_archive(self, input_path, output_path=None, image_format=DEFAULT_OPTIMIZE_FORMAT,
+                         quality=DEFAULT_OPTIMIZE_QUALITY, executor=None, reencode_lossy=False):
+        """
+        Re-encode the pages of a CBZ/CBR file to a smaller codec.
+        
+        Pages are re-encoded on a process pool and only replaced when the new
+        encoding is smaller. By default only losslessly stored pages (PNG,
+        BMP, GIF, lossless WebP) are re-encoded, so running the optimizer
+        again does not add another generation of lossy artifacts. Embedded
+        ICC profiles are kept. The result is written as a STORED CBZ (images do
+        not compress further) under a temp name and renamed into place, so it
+        can safely replace the input. Non-image members such as ComicInfo.xml
+        are copied unchanged; member names keep their stem, so the natural
+        sort order of the pages does not change.
+        
+        Args:
+            input_path (str): Path to the CBZ/CBR file.
+            output_path (str, optional): Path for the output CBZ file. If not
+                provided, it will use the same name as the input file with
+                .cbz extension, replacing a CBZ input. An existing file other
+                than the input is never overwritten.
+            image_format (str, optional): 'webp' or 'jpeg'.
+            quality (int, optional): Encoder quality, 1-100.
+            executor (concurrent.futures.Executor, optional): Pool to encode
+                on; a ProcessPoolExecutor is created if not provided.
+            reencode_lossy (bool, optional): Also re-encode JPEG, JPEG 2000
+                and lossy WebP pages.
+        
+        Returns:
+            dict: Report with input_path, output_path, bytes_before,
+                bytes_after, bytes_saved, pages, pages_recompressed and
+                pages_kept, or None on failure.
+        """
+        if image_format not in OPTIMIZE_EXTENSIONS:
+            logger.error(f"不支持的目标格式: {image_format}")
+            return None
+        if not 1 <= quality <= 100:
+            logger.error(f"编码质量必须在1到100之间: {quality}")
+            return None
+        
+        if not output_path:
+            output_path = os.path.splitext(input_path)[0] + '.cbz'
+        
+        logger.info(f"开始优化: {input_path} -> {output_path}")
+        
+        if not os.path.exists(input_path):
+            logger.error(f"输入文件不存在: {input_path}")
+            return None
+        
+        # Only the input itself may be replaced, e.g. never book.cbz when optimizing book.cbr
+        in_place = os.path.exists(output_path) and os.path.samefile(output_path, input_path)
+        if os.path.exists(output_path) and not in_place:
+            logger.error(f"输出文件已存在，不会覆盖: {output_path}")
+            return None
+        
+        own_executor = executor is None
+        partial_cbz_path = output_path + '.part'
+        report = {
+            'input_path': input_path,
+            'output_path': output_path,
+            'pages': 0,
+            'pages_recompressed': 0,
+            'pages_kept': 0,
+        }
+        try:
+            report['bytes_before'] = os.path.getsize(input_path)
+            if own_executor:
+                executor = ProcessPoolExecutor()
+            
+            with self._open_archive(input_path) as archive, \
+                    zipfile.ZipFile(partial_cbz_path, 'w', zipfile.ZIP_STORED) as zip_ref:
+                image_members = self._get_sorted_image_members(archive)
+                image_member_set = set(image_members)
+                other_members = [name for name in archive.namelist()
+                                 if not name.endswith('/') and name not in image_member_set]
+                used_names = set(archive.namelist())
+                
+                # Keep a bounded number of pages in flight so memory stays flat
+                max_in_flight = (os.cpu_count() or 1) * 2
+                in_flight = deque()
+                
+                def write_result(member, data, future):
+                    try:
+                        new_data = future.result()
+                    except Exception as e:
+                        logger.warning(f"无法重新编码 {member}，保留原图: {e}")
+                        new_data = None
+                    new_name = os.path.splitext(member)[0] + OPTIMIZE_EXTENSIONS[image_format]
+                    if new_data is not None and (new_name == member or new_name not in used_names):
+                        used_names.add(new_name)
+                        zip_ref.writestr(new_name, new_data)
+                        report['pages_recompressed'] += 1
+                    else:
+                        zip_ref.writestr(member, data)
+                        report['pages_kept'] += 1
+                    report['pages'] += 1
+                
+                for member in image_members:
+                    data = archive.read(member)
+                    in_flight.append((member, data, executor.submit(_recompress_image, data, image_format, quality,
+                                                                   reencode_lossy)))
+                    if len(in_flight) >= max_in_flight:
+                        write_result(*in_flight.popleft())
+                while in_flight:
+                    write_result(*in_flight.popleft())
+                
+                for member in other_members:
+                    zip_ref.writestr(member, archive.read(member))
+            
+            if report['pages'] == 0:
+                logger.error("在压缩包中没有找到图片文件")
+                return None
+            
+            if in_place and os.path.getsize(partial_cbz_path) >= report['bytes_before']:
+                logger.info(f"优化后的文件没有变小，保留原文件: {input_path}")
+                report['pages_recompressed'] = 0
+                report['pages_kept'] = report['pages']
+                report['bytes_after'] = report['bytes_before']
+            else:
+                os.replace(partial_cbz_path, output_path)
+                report['bytes_after'] = os.path.getsize(output_path)
+            
+            report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+            logger.info(f"优化完成: {report['pages_recompressed']}/{report['pages']} 页重新编码，"
+                        f"节省 {report['bytes_saved']} 字节")
+            return report
+        except Exception as e:
+            logger.error(f"优化压缩包时出错: {e}")
+            logger.error(traceback.format_exc())
+            return None
+        finally:
+            if os.path.exists(partial_cbz_path):
+                os.unlink(partial_cbz_path)
+            if own_executor and executor is not None:
+                executor.shutdown()
+    
+    def _add_archive_work(self, progress, input_path):
+        """Register the uncompressed bytes each conversion stage handles for an archive."""
+        with self._open_archive(input_path) as archive:
+            extract_bytes = sum(info.file_size for info in archive.infolist() if not info.is_dir())
+            image_bytes = sum(archive.getinfo(name).file_size
+                              for name in self._get_sorted_image_members(archive))
+        progress.add_total('extract', extract_bytes)
+        progress.add_total('pdf', image_bytes)
+        progress.add_total('write', image_bytes)
+    
+    def convert(self, input_path, output_path=None, embed_thumbnails=False,
+                progress_callback=None, cancel_token=None):
         """
         Convert a CBZ file to PDF.
         
@@ -206,6 +1099,11 @@ class CBZtoPDFConverter:
             input_path (str): Path to the CBZ file.
             output_path (str, optional): Path for the output PDF file.
                 If not provided, it will use the same name as the input file with .pdf extension.
+            embed_thumbnails (bool, optional): Embed a /Thumb image in every page.
+            progress_callback (callable, optional): Called with a progress dict
+                after every extracted member and every page (see ProgressTracker).
+            cancel_token (CancellationToken, optional): Checked between members
+                and pages. On cancel, temp data is removed and no PDF is written.
         
         Returns:
             bool: True if conversion was successful, False otherwise.
@@ -227,6 +1125,11 @@ class CBZtoPDFConverter:
         logger.info(f"输出路径: {output_path}")
         
         try:
+            progress = None
+            if progress_callback and file_ext in ('.cbz', '.cbr'):
+                progress = ProgressTracker(progress_callback, input_path)
+                self._add_archive_work(progress, input_path)
+            
             # Create temporary directory
             extract_dir = self._create_temp_dir()
             logger.info(f"创建临时目录: {extract_dir}")
@@ -235,10 +1138,10 @@ class CBZtoPDFConverter:
             extraction_success = False
             if file_ext == '.cbz':
                 logger.info("开始解压CBZ文件")
-                extraction_success = self._extract_cbz(input_path, extract_dir)
+                extraction_success = self._extract_cbz(input_path, extract_dir, progress, cancel_token)
             elif file_ext == '.cbr':
                 logger.info("开始解压CBR文件")
-                extraction_success = self._extract_cbr(input_path, extract_dir)
+                extraction_success = self._extract_cbr(input_path, extract_dir, progress, cancel_token)
             else:
                 logger.error(f"不支持的文件格式: {file_ext}")
                 self._clean_temp_dir()
@@ -261,7 +1164,8 @@ class CBZtoPDFConverter:
             
             # Create PDF
             logger.info("开始创建PDF")
-            pdf_success = self._create_pdf(image_files, output_path)
+            pdf_success = self._create_pdf(image_files, output_path, embed_thumbnails,
+                                           progress, cancel_token)
             
             # Clean up
             logger.info("清理临时文件")
@@ -274,14 +1178,380 @@ class CBZtoPDFConverter:
             
             return pdf_success
         
+        except ConversionCancelled:
+            logger.info(f"转换已取消: {input_path}")
+            self._clean_temp_dir()
+            return False
+        
         except Exception as e:
             logger.error(f"转换过程中出错: {e}")
             logger.error(traceback.format_exc())
             self._clean_temp_dir()
             return False
 
+class PDFtoCBZConverter:
+    """
+    A class to convert image-only PDF files back to CBZ without rasterizing.
+    
+    Each page must show a single image XObject. DCTDecode (JPEG) and JPXDecode
+    (JPEG 2000) streams are written to the CBZ byte for byte; other images
+    are decoded from their PDF filters and stored losslessly as PNG. Image
+    masks (/SMask, /Mask) are not carried over; a warning is logged.
+    """
+    
+    # PIL modes for PDF color spaces with 8 bits per component
+    COLOR_SPACE_MODES = {'/DeviceGray': 'L', '/DeviceRGB': 'RGB', '/DeviceCMYK': 'CMYK'}
+    # PIL modes for ICCBased color spaces by number of components
+    ICC_COMPONENT_MODES = {1: 'L', 3: 'RGB', 4: 'CMYK'}
+    
+    def _get_page_image(self, page):
+        """Return the single image XObject drawn by a page, or None."""
+        resources = _get_inherited_page_value(page, '/Resources')
+        if resources is None:
+            return None
+        resources = resources.get_object()
+        if '/XObject' not in resources:
+            return None
+        
+        images = [xobject.get_object() for xobject in resources['/XObject'].values()
+                  if xobject.get_object().get('/Subtype') == '/Image']
+        return images[0] if len(images) == 1 else None
+    
+    def _get_filters(self, image):
+        """Return the image's filter names as a list."""
+        filters = image.get('/Filter')
+        if filters is None:
+            return []
+        filters = filters.get_object()
+        if isinstance(filters, str):
+            return [filters]
+        return [f.get_object() for f in filters]
+    
+    def _decode_filters(self, image, filters):
+        """Undo the image's stream filters and return the raw pixel data."""
+        from PyPDF2.filters import ASCII85Decode, FlateDecode, LZWDecode
+        
+        decode_parms = image['/DecodeParms'] if '/DecodeParms' in image else None
+        if not isinstance(decode_parms, list):
+            decode_parms = [decode_parms] * len(filters)
+        
+        data = image._data
+        for name, parms in zip(filters, decode_parms):
+            parms = parms.get_object() if parms is not None else None
+            if name == '/ASCIIHexDecode':
+                # Decoded here because PyPDF2's ASCIIHexDecode fails on bytes input
+                hex_digits = re.sub(rb'\s+', b'', bytes(data)).split(b'>')[0]
+                if len(hex_digits) % 2:
+                    hex_digits += b'0'
+                data = bytes.fromhex(hex_digits.decode('ascii'))
+            elif name == '/ASCII85Decode':
+                data = ASCII85Decode.decode(data)
+            elif name == '/FlateDecode':
+                data = self._undo_predictor(FlateDecode.decode(data, None), parms, image)
+            elif name == '/LZWDecode':
+                data = self._undo_predictor(LZWDecode.decode(data, None), parms, image)
+            else:
+                raise ValueError(f"不支持的图片编码: {filters}")
+            if isinstance(data, str):
+                data = data.encode('latin-1')
+        return data
+    
+    def _undo_predictor(self, data, parms, image):
+        """
+        Reverse the TIFF or PNG predictor of Flate/LZW-decoded image data.
+        
+        Done here because PyPDF2 ignores /Colors and /BitsPerComponent when
+        undoing predictors, which breaks RGB and sub-byte images.
+        """
+        if isinstance(data, str):
+            data = data.encode('latin-1')
+        predictor = parms.get('/Predictor', 1) if parms is not None else 1
+        if predictor == 1:
+            return data
+        
+        colors = parms.get('/Colors', 1)
+        bits = parms.get('/BitsPerComponent', image['/BitsPerComponent'] if '/BitsPerComponent' in image else 8)
+        columns = parms.get('/Columns', 1)
+        bytes_per_pixel = max(1, (colors * bits + 7) // 8)
+        row_length = (colors * bits * columns + 7) // 8
+        
+        if predictor == 2:
+            if bits != 8:
+                raise ValueError(f"不支持的TIFF预测器位深度: {bits}")
+            rows = bytearray(data)
+            for start in range(0, len(rows), row_length):
+                for i in range(start + bytes_per_pixel, min(start + row_length, len(rows))):
+                    rows[i] = (rows[i] + rows[i - bytes_per_pixel]) & 0xFF
+            return bytes(rows)
+        
+        # PNG predictors: every row starts with its own filter type byte
+        output = bytearray()
+        previous = bytearray(row_length)
+        for start in range(0, len(data) - row_length, row_length + 1):
+            filter_type = data[start]
+            row = bytearray(data[start + 1:start + 1 + row_length])
+            if filter_type == 1:
+                for i in range(bytes_per_pixel, row_length):
+                    row[i] = (row[i] + row[i - bytes_per_pixel]) & 0xFF
+            elif filter_type == 2:
+                for i in range(row_length):
+                    row[i] = (row[i] + previous[i]) & 0xFF
+            elif filter_type == 3:
+                for i in range(row_length):
+                    left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                    row[i] = (row[i] + (left + previous[i]) // 2) & 0xFF
+            elif filter_type == 4:
+                for i in range(row_length):
+                    left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                    up_left = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                    estimate = left + previous[i] - up_left
+                    distances = (abs(estimate - left), abs(estimate - previous[i]), abs(estimate - up_left))
+                    if distances[0] <= distances[1] and distances[0] <= distances[2]:
+                        paeth = left
+                    elif distances[1] <= distances[2]:
+                        paeth = previous[i]
+                    else:
+                        paeth = up_left
+                    row[i] = (row[i] + paeth) & 0xFF
+            elif filter_type != 0:
+                raise ValueError(f"无效的PNG预测器类型: {filter_type}")
+            output += row
+            previous = row
+        return bytes(output)
+    
+    def _ccitt_to_png(self, image):
+        """Decode a CCITT fax (bilevel) image XObject and encode it as PNG."""
+        from PIL import Image, ImageOps
+        from PyPDF2.filters import CCITTFaxDecode
+        
+        decode_parms = image['/DecodeParms'] if '/DecodeParms' in image else None
+        if isinstance(decode_parms, list):
+            decode_parms = decode_parms[0].get_object()
+        
+        # PyPDF2 wraps the fax data in a WhiteIsZero TIFF that Pillow can decode
+        tiff = CCITTFaxDecode.decode(image._data, decode_parms, image['/Height'])
+        img = Image.open(io.BytesIO(tiff))
+        
+        # In the PDF, BlackIs1 makes the black runs decode to 1 (white in
+        # DeviceGray), and a /Decode of [1 0] inverts the result again
+        black_is_1 = bool(decode_parms is not None and decode_parms.get('/BlackIs1', False))
+        decode = image['/Decode'] if '/Decode' in image else None
+        inverted = decode is not None and list(decode)[:2] == [1, 0]
+        if black_is_1 != inverted:
+            img = ImageOps.invert(img.convert('L')).convert('1')
+        
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG')
+        return buffer.getvalue()
+    
+    def _get_color_space(self, image):
+        """
+        Map an image's color space to a PIL mode.
+        
+        Returns:
+            tuple: (mode, palette), where palette holds RGB triplets for
+                indexed images and is None otherwise.
+        """
+        color_space = image['/ColorSpace'] if '/ColorSpace' in image else '/DeviceGray'
+        palette = None
+        
+        if isinstance(color_space, list):
+            family = color_space[0].get_object()
+            if family == '/ICCBased':
+                mode = self.ICC_COMPONENT_MODES.get(color_space[1].get_object().get('/N'))
+            elif family == '/Indexed':
+                mode = 'P'
+                lookup = color_space[3].get_object()
+                if hasattr(lookup, 'get_data'):
+                    palette = lookup.get_data()
+                else:
+                    palette = getattr(lookup, 'original_bytes', lookup)
+                palette = bytes(palette)
+                base = color_space[1].get_object()
+                if base == '/DeviceGray' or (isinstance(base, list) and base[0] == '/ICCBased'
+                                             and base[1].get_object().get('/N') == 1):
+                    palette = bytes(value for gray in palette for value in (gray, gray, gray))
+                elif base != '/DeviceRGB' and not (isinstance(base, list) and base[0] == '/ICCBased'
+                                                   and base[1].get_object().get('/N') == 3):
+                    raise ValueError(f"不支持的索引色基础色彩空间: {base}")
+            else:
+                mode = None
+        else:
+            mode = self.COLOR_SPACE_MODES.get(color_space)
+        
+        if mode is None:
+            raise ValueError(f"不支持的色彩空间: {color_space}")
+        return mode, palette
+    
+    def _get_decode_parms(self, image):
+        """Return the image's first /DecodeParms dictionary, or None."""
+        decode_parms = image['/DecodeParms'] if '/DecodeParms' in image else None
+        if isinstance(decode_parms, list):
+            decode_parms = decode_parms[0]
+        return decode_parms.get_object() if decode_parms is not None else None
+    
+    def _flate_to_png(self, image):
+        """
+        Wrap a Flate image that uses PNG predictors as a PNG without decoding it.
+        
+        With /Predictor 10-15 the Flate data is laid out exactly like a PNG
+        IDAT stream: zlib-compressed rows that each start with their PNG
+        filter type. Such pages are rewrapped byte for byte.
+        
+        Returns:
+            bytes: The PNG file, or None if the image does not map onto one.
+        """
+        parms = self._get_decode_parms(image)
+        if parms is None or parms.get('/Predictor', 1) < 10 or '/Decode' in image:
+            return None
+        
+        width, height = image['/Width'], image['/Height']
+        bits = image['/BitsPerComponent'] if '/BitsPerComponent' in image else 8
+        colors = parms.get('/Colors', 1)
+        if parms.get('/BitsPerComponent', bits) != bits or parms.get('/Columns', 1) != width:
+            return None
+        
+        mode, palette = self._get_color_space(image)
+        if mode == 'L' and colors == 1 and bits in (1, 2, 4, 8, 16):
+            color_type = 0
+        elif mode == 'RGB' and colors == 3 and bits in (8, 16):
+            color_type = 2
+        elif mode == 'P' and colors == 1 and bits in (1, 2, 4, 8):
+            color_type = 3
+        else:
+            return None
+        
+        def chunk(chunk_type, data):
+            return (len(data).to_bytes(4, 'big') + chunk_type + data
+                    + zlib.crc32(chunk_type + data).to_bytes(4, 'big'))
+        
+        header = width.to_bytes(4, 'big') + height.to_bytes(4, 'big') + bytes([bits, color_type, 0, 0, 0])
+        png = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+        if palette is not None:
+            png += chunk(b'PLTE', palette[:3 * (1 << bits)])
+        return png + chunk(b'IDAT', bytes(image._data)) + chunk(b'IEND', b'')
+    
+    def _image_to_png(self, image, filters):
+        """Decode a non-JPEG image XObject and encode it losslessly as PNG."""
+        from PIL import Image, ImageOps
+        
+        width, height = image['/Width'], image['/Height']
+        bits = image['/BitsPerComponent'] if '/BitsPerComponent' in image else 8
+        mode, palette = self._get_color_space(image)
+        rawmode = mode
+        if bits != 8:
+            if bits not in (1, 2, 4) or mode not in ('L', 'P'):
+                raise ValueError(f"不支持的位深度: {bits}")
+            rawmode = f"{mode};{bits}"
+            if mode == 'L' and bits == 1:
+                mode = rawmode = '1'
+        
+        data = self._decode_filters(image, filters)
+        img = Image.frombytes(mode, (width, height), data, 'raw', rawmode)
+        if palette is not None:
+            img.putpalette(palette)
+        
+        decode = image['/Decode'] if '/Decode' in image else None
+        if mode == '1' and decode is not None and list(decode)[:2] == [1, 0]:
+            img = ImageOps.invert(img.convert('L')).convert('1')
+        if mode == 'CMYK':
+            # PNG has no CMYK; RGB is the closest lossless container
+            img = img.convert('RGB')
+        
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG')
+        return buffer.getvalue()
+    
+    def _extract_page_image(self, image):
+        """
+        Get the file extension and bytes of an image XObject.
+        
+        Returns:
+            tuple: (extension, data) for the CBZ member.
+        """
+        filters = self._get_filters(image)
+        if filters == ['/DCTDecode']:
+            return '.jpg', image._data
+        if filters == ['/JPXDecode']:
+            # JPXDecode streams are either JP2 files or bare JPEG 2000 codestreams
+            if image._data.startswith(IMAGE_SIGNATURES['.jp2'][0]):
+                return '.jp2', image._data
+            if image._data.startswith(IMAGE_SIGNATURES['.j2k'][0]):
+                return '.j2k', image._data
+            raise ValueError("无法识别的JPEG 2000数据")
+        if filters == ['/CCITTFaxDecode']:
+            return '.png', self._ccitt_to_png(image)
+        if filters == ['/FlateDecode']:
+            png = self._flate_to_png(image)
+            if png is not None:
+                return '.png', png
+        if all(f in ('/FlateDecode', '/LZWDecode', '/ASCII85Decode', '/ASCIIHexDecode') for f in filters):
+            return '.png', self._image_to_png(image, filters)
+        raise ValueError(f"不支持的图片编码: {filters}")
+    
+    def convert(self, input_path, output_path=None):
+        """
+        Convert an image-only PDF file to CBZ.
+        
+        Pages are read and written one at a time into a STORED zip with
+        zero-padded names, so memory use stays flat for long PDFs.
+        
+        Args:
+            input_path (str): Path to the PDF file.
+            output_path (str, optional): Path for the output CBZ file.
+                If not provided, it will use the same name as the input file with .cbz extension.
+        
+        Returns:
+            bool: True if conversion was successful, False otherwise.
+        """
+        logger.info(f"开始转换PDF: {input_path}")
+        
+        if not os.path.exists(input_path):
+            logger.error(f"输入文件不存在: {input_path}")
+            return False
+        
+        if not output_path:
+            output_path = os.path.splitext(input_path)[0] + '.cbz'
+        
+        logger.info(f"输出路径: {output_path}")
+        
+        partial_cbz_path = output_path + '.part'
+        try:
+            with zipfile.ZipFile(partial_cbz_path, 'w', zipfile.ZIP_STORED) as zip_ref:
+                for index, total_pages, page in _iter_pdf_pages(input_path):
+                    image = self._get_page_image(page)
+                    if image is None:
+                        logger.error(f"第 {index} 页不是单张图片，无法无损提取")
+                        return False
+                    for mask_key in ('/SMask', '/Mask'):
+                        if mask_key in image:
+                            logger.warning(f"第 {index} 页的图片带有{mask_key}遮罩，提取时将被忽略")
+                    
+                    extension, data = self._extract_page_image(image)
+                    name = f"{index:0{max(4, len(str(total_pages)))}d}{extension}"
+                    logger.info(f"正在提取页面 {index}/{total_pages}: {name}")
+                    zip_ref.writestr(name, data)
+            
+            os.replace(partial_cbz_path, output_path)
+            logger.info(f"成功创建CBZ，文件大小: {os.path.getsize(output_path)} 字节")
+            return True
+        except Exception as e:
+            logger.error(f"转换PDF时出错: {e}")
+            logger.error(traceback.format_exc())
+            return False
+        finally:
+            if os.path.exists(partial_cbz_path):
+                os.unlink(partial_cbz_path)
+
+def _get_output_path(input_file, output_dir=None, extension='.pdf'):
+    """Get the output path for an input file, next to it or in output_dir."""
+    if output_dir:
+        return os.path.join(output_dir, os.path.basename(os.path.splitext(input_file)[0]) + extension)
+    return os.path.splitext(input_file)[0] + extension
+
 # Function for batch conversion
-def batch_convert(input_files, output_dir=None):
+def batch_convert(input_files, output_dir=None, embed_thumbnails=False,
+                  progress_callback=None, cancel_token=None, validate=False):
     """
     Convert multiple CBZ files to PDF.
     
@@ -289,6 +1559,13 @@ def batch_convert(input_files, output_dir=None):
         input_files (list): List of paths to CBZ files.
         output_dir (str, optional): Directory for output PDF files.
             If not provided, PDFs will be created in the same directory as input files.
+        embed_thumbnails (bool, optional): Embed a /Thumb image in every page.
+        progress_callback (callable, optional): Per-page progress callback,
+            passed to CBZtoPDFConverter.convert for every file.
+        cancel_token (CancellationToken, optional): Stops the current file and
+            skips the remaining ones; they are reported as failed.
+        validate (bool, optional): Pre-scan all files with validate_archives and
+            skip the invalid ones; they are reported as failed.
     
     Returns:
         dict: Dictionary with input file paths as keys and conversion status as values.
@@ -296,14 +1573,788 @@ def batch_convert(input_files, output_dir=None):
     converter = CBZtoPDFConverter()
     results = {}
     
+    invalid_files = set()
+    if validate:
+        report = validate_archives(input_files)
+        invalid_files = {entry['path'] for entry in report['archives'] if not entry['ok']}
+    
     for input_file in input_files:
-        if output_dir:
-            output_file = os.path.join(output_dir, os.path.basename(os.path.splitext(input_file)[0]) + '.pdf')
-        else:
-            output_file = os.path.splitext(input_file)[0] + '.pdf'
+        if cancel_token and cancel_token.cancelled:
+            results[input_file] = False
+            continue
         
+        if input_file in invalid_files:
+            logger.error(f"预检查未通过，跳过: {input_file}")
+            results[input_file] = False
+            continue
+        
+        output_file = _get_output_path(input_file, output_dir)
         logger.info(f"Converting {input_file} to {output_file}")
-        success = converter.convert(input_file, output_file)
+        success = converter.convert(input_file, output_file, embed_thumbnails,
+                                    progress_callback, cancel_token)
         results[input_file] = success
     
-    return results 
\ No newline at end of file
+    return results
+
+
+def _is_lossy_image(img, data):
+    """Whether an opened image was stored with a lossy codec."""
+    if img.format in ('JPEG', 'JPEG2000'):
+        # JPEG 2000 can be lossless, but that is not visible from the header
+        return True
+    if img.format != 'WEBP':
+        return False
+    
+    # Lossless WebP stores its image in a VP8L chunk, lossy WebP in VP8
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        if chunk_id == b'VP8L':
+            return False
+        if chunk_id == b'VP8 ':
+            return True
+        chunk_size = int.from_bytes(data[offset + 4:offset + 8], 'little')
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return True
+
+def _recompress_image(data, image_format, quality, reencode_lossy=False):
+    """
+    Re-encode one page; runs in a worker process.
+    
+    Returns:
+        bytes: The new encoding, or None if it would not be smaller or the
+            page is better left alone (animations, transparency for JPEG,
+            lossy sources unless reencode_lossy is set).
+    """
+    from PIL import Image
+    
+    img = Image.open(io.BytesIO(data))
+    if getattr(img, 'n_frames', 1) > 1:
+        return None
+    if not reencode_lossy and _is_lossy_image(img, data):
+        # Another lossy generation costs quality on every run
+        return None
+    
+    # An ICC profile only applies while the image keeps its color family
+    families = {'1': 'gray', 'L': 'gray', 'LA': 'gray', 'I': 'gray', 'F': 'gray', 'CMYK': 'cmyk'}
+    source_family = families.get(img.mode, 'rgb')
+    icc_profile = img.info.get('icc_profile')
+    
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+    buffer = io.BytesIO()
+    if image_format == 'jpeg':
+        if has_alpha:
+            return None
+        if img.mode not in ('L', 'RGB'):
+            img = img.convert('RGB')
+        if families.get(img.mode, 'rgb') != source_family:
+            icc_profile = None
+        img.save(buffer, 'JPEG', quality=quality, optimize=True, icc_profile=icc_profile)
+    else:
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+        if source_family != 'rgb':
+            icc_profile = None
+        img.save(buffer, 'WEBP', quality=quality, icc_profile=icc_profile)
+    
+    new_data = buffer.getvalue()
+    return new_data if len(new_data) < len(data) else None
+
+# Function for batch archive optimization
+def optimize_archives(input_files, output_dir=None, image_format=DEFAULT_OPTIMIZE_FORMAT,
+                      quality=DEFAULT_OPTIMIZE_QUALITY, max_workers=None, reencode_lossy=False):
+    """
+    Re-encode the pages of multiple CBZ/CBR files to a smaller codec.
+    
+    Args:
+        input_files (list): List of paths to CBZ/CBR files.
+        output_dir (str, optional): Directory for output CBZ files.
+            If not provided, CBZ files are optimized in place and CBR files
+            get a CBZ next to them.
+        image_format (str, optional): 'webp' or 'jpeg'.
+        quality (int, optional): Encoder quality, 1-100.
+        max_workers (int, optional): Number of encoder processes.
+        reencode_lossy (bool, optional): Also re-encode JPEG, JPEG 2000 and
+            lossy WebP pages.
+    
+    Returns:
+        dict: Dictionary with input file paths as keys and optimize reports
+            (see CBZtoPDFConverter.optimize_archive, None on failure) as values.
+    """
+    converter = CBZtoPDFConverter()
+    results = {}
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for input_file in input_files:
+            output_file = _get_output_path(input_file, output_dir, '.cbz')
+            results[input_file] = converter.optimize_archive(input_file, output_file, image_format,
+                                                             quality, executor, reencode_lossy)
+    
+    return results
+
+# Function for archive pre-validation
+def _reserve_unique_path(directory, name):
+    """
+    Create an empty file named after name in directory and return its path.
+    
+    If the name is taken, " (1)", " (2)" and so on are added before the
+    extension. The file is created exclusively, so the returned path never
+    belongs to an existing file and can be moved onto safely.
+    """
+    stem, extension = os.path.splitext(name)
+    counter = 0
+    while True:
+        candidate = name if counter == 0 else f"{stem} ({counter}){extension}"
+        path = os.path.join(directory, candidate)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            counter += 1
+
+def validate_archives(input_files, max_workers=None, fail_fast=True, quarantine_dir=None):
+    """
+    Check archives for corrupt or truncated images before converting them.
+    
+    Every image member is read in full, which verifies its CRC, and its
+    signature, dimensions and ending are checked without decoding pixels.
+    Members are checked in chunks spread over a thread pool, so large archives
+    and many archives are scanned in parallel. Solid RAR archives are checked
+    in a single pass by one task, as their members cannot be read separately
+    without decompressing everything before them.
+    
+    Args:
+        input_files (list): List of paths to CBZ/CBR files.
+        max_workers (int, optional): Number of worker threads.
+        fail_fast (bool, optional): Stop checking an archive after its first
+            invalid member. Disable it to list every invalid member.
+        quarantine_dir (str, optional): Move invalid archives to this directory.
+    
+    Returns:
+        dict: A JSON-serializable report with the keys total, valid, invalid
+            and archives (one entry per input file with path, ok,
+            image_members, errors and, if moved, quarantined_to).
+    """
+    converter = CBZtoPDFConverter()
+    entries = {}
+    failed_archives = set() if fail_fast else None
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tasks = []
+        for input_file in input_files:
+            entry = {'path': input_file, 'ok': True, 'image_members': 0, 'errors': []}
+            entries[input_file] = entry
+            
+            try:
+                with converter._open_archive(input_file) as archive:
+                    members = converter._get_sorted_image_members(archive)
+                    solid = hasattr(archive, 'is_solid') and archive.is_solid()
+            except Exception as e:
+                entry['errors'].append({'member': None, 'error': f"无法打开压缩包: {type(e).__name__}: {e}"})
+                continue
+            
+            entry['image_members'] = len(members)
+            if not members:
+                entry['errors'].append({'member': None, 'error': "在压缩包中没有找到图片文件"})
+                continue
+            
+            if solid:
+                future = executor.submit(converter._validate_members, input_file, members,
+                                         failed_archives, True)
+                tasks.append((input_file, future))
+                continue
+            
+            for start in range(0, len(members), VALIDATION_CHUNK_SIZE):
+                chunk = members[start:start + VALIDATION_CHUNK_SIZE]
+                future = executor.submit(converter._validate_members, input_file, chunk, failed_archives)
+                tasks.append((input_file, future))
+        
+        for input_file, future in tasks:
+            try:
+                entries[input_file]['errors'].extend(future.result())
+            except Exception as e:
+                entries[input_file]['errors'].append({'member': None, 'error': f"{type(e).__name__}: {e}"})
+    
+    for entry in entries.values():
+        entry['ok'] = not entry['errors']
+        if entry['ok']:
+            continue
+        
+        for error in entry['errors']:
+            logger.error(f"预检查失败 {entry['path']}: {error['member']}: {error['error']}")
+        
+        if quarantine_dir:
+            try:
+                os.makedirs(quarantine_dir, exist_ok=True)
+                target = _reserve_unique_path(quarantine_dir, os.path.basename(entry['path']))
+                try:
+                    shutil.move(entry['path'], target)
+                except Exception:
+                    os.unlink(target)
+                    raise
+                entry['quarantined_to'] = target
+                logger.info(f"已隔离: {entry['path']} -> {target}")
+            except Exception as e:
+                logger.error(f"无法隔离 {entry['path']}: {e}")
+    
+    archives = list(entries.values())
+    valid = sum(1 for entry in archives if entry['ok'])
+    logger.info(f"预检查完成: {valid} 个有效, {len(archives) - valid} 个无效")
+    return {
+        'total': len(archives),
+        'valid': valid,
+        'invalid': len(archives) - valid,
+        'archives': archives,
+    }
+
+class ThumbnailCache:
+    """
+    A directory of cover thumbnails whose total size is kept under a limit.
+    
+    Thumbnails are keyed by archive path, modification time and size, so an
+    archive that changes on disk gets a fresh thumbnail. When the directory
+    grows past max_bytes, the least recently used thumbnails are removed. The
+    thumbnail stored last is never evicted by its own put, so a single
+    thumbnail larger than max_bytes still gets cached.
+    """
+    
+    def __init__(self, cache_dir, max_bytes=DEFAULT_THUMBNAIL_CACHE_BYTES):
+        """Initialize the cache, creating the directory if needed."""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        
+        # Track sizes in memory so a put does not rescan the whole directory
+        self._sizes = {}
+        for name in os.listdir(cache_dir):
+            if name.endswith('.jpg'):
+                path = os.path.join(cache_dir, name)
+                self._sizes[path] = os.path.getsize(path)
+        self._total_bytes = sum(self._sizes.values())
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _cache_path(self, input_path, size):
+        """Get the cache file path for an archive and thumbnail size."""
+        stat = os.stat(input_path)
+        key = f"{os.path.abspath(input_path)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.jpg')
+    
+    def get(self, input_path, size=DEFAULT_THUMBNAIL_SIZE):
+        """Return the cached thumbnail path, or None on a cache miss."""
+        path = self._cache_path(input_path, size)
+        if not os.path.exists(path):
+            return None
+        
+        # Refresh the modification time so eviction treats it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+    
+    def put(self, input_path, size, img):
+        """Store a thumbnail image and return its path."""
+        path = self._cache_path(input_path, size)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            img.save(temp_path, 'JPEG', quality=85)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        
+        with self._lock:
+            self._total_bytes -= self._sizes.get(path, 0)
+            self._sizes[path] = os.path.getsize(path)
+            self._total_bytes += self._sizes[path]
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+    
+    def _evict(self, keep=None):
+        """Remove least recently used thumbnails, except keep, until the cache fits."""
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+        
+        for path in sorted(self._sizes, key=last_used):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.warning(f"无法删除缩略图 {path}: {e}")
+            self._total_bytes -= self._sizes.pop(path)
+
+# Function for bulk thumbnail generation
+def generate_thumbnails(input_files, cache_dir, size=DEFAULT_THUMBNAIL_SIZE,
+                        max_cache_bytes=DEFAULT_THUMBNAIL_CACHE_BYTES, max_workers=None):
+    """
+    Write cover thumbnails for multiple CBZ/CBR files to a cache directory.
+    
+    Args:
+        input_files (list): List of paths to CBZ/CBR files.
+        cache_dir (str): Directory for the thumbnail cache.
+        size (tuple, optional): (width, height) bounding box of the thumbnails.
+        max_cache_bytes (int, optional): Upper bound for the cache directory size.
+        max_workers (int, optional): Number of archives decoded in parallel.
+    
+    Returns:
+        dict: Dictionary with input file paths as keys and thumbnail paths
+            (or None on failure) as values.
+    """
+    converter = CBZtoPDFConverter()
+    cache = ThumbnailCache(cache_dir, max_cache_bytes)
+    
+    def make_thumbnail(input_file):
+        try:
+            cached_path = cache.get(input_file, size)
+            if cached_path:
+                return cached_path
+            
+            img = converter.get_cover_image(input_file, size)
+            if img is None:
+                return None
+            return cache.put(input_file, size, img)
+        except Exception as e:
+            logger.error(f"生成缩略图时出错 {input_file}: {e}")
+            logger.error(traceback.format_exc())
+            return None
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        thumbnails = executor.map(make_thumbnail, input_files)
+        return dict(zip(input_files, thumbnails))
+
+class WorkQueue:
+    """
+    A work queue shared by several hosts through a directory, without a broker.
+    
+    Every input file is a job identified by a hash of its absolute path. The
+    queue directory holds one lease file per running job and one done marker
+    per finished job:
+    
+        <queue_dir>/leases/<job_id>.lease   worker id, token and expiry time
+        <queue_dir>/done/<job_id>.json      outcome of the job
+    
+    A lease is created atomically with os.link, so only one worker can claim a
+    job, and it is renewed by heartbeats. A lease that is not renewed before it
+    expires (because its worker died) can be reclaimed by any other worker.
+    Expiry times are compared across hosts, so their clocks must be in sync.
+    """
+    
+    def __init__(self, queue_dir, worker_id=None, lease_ttl=DEFAULT_LEASE_TTL):
+        """Initialize the queue, creating its directories if needed."""
+        self.queue_dir = queue_dir
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = lease_ttl
+        self.leases_dir = os.path.join(queue_dir, 'leases')
+        self.done_dir = os.path.join(queue_dir, 'done')
+        os.makedirs(self.leases_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+        # Tokens of the leases held by this worker, by job id
+        self._tokens = {}
+    
+    def _job_id(self, input_path):
+        """Get the job id of an input file."""
+        return hashlib.sha1(os.path.abspath(input_path).encode('utf-8')).hexdigest()
+    
+    def _lease_path(self, input_path):
+        """Get the lease file path of a job."""
+        return os.path.join(self.leases_dir, self._job_id(input_path) + '.lease')
+    
+    def _done_path(self, input_path):
+        """Get the done marker path of a job."""
+        return os.path.join(self.done_dir, self._job_id(input_path) + '.json')
+    
+    def _write_temp(self, data):
+        """Write JSON to a uniquely named temp file in the leases directory."""
+        temp_path = os.path.join(self.leases_dir, f".{self.worker_id}-{uuid.uuid4().hex}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        return temp_path
+    
+    def _read_json(self, path):
+        """Read a lease or done marker, or return None if it is missing or unreadable."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _new_lease(self, input_path, token):
+        """Build the lease contents for a job held by this worker, expiring one TTL from now."""
+        return {
+            'worker_id': self.worker_id,
+            'token': token,
+            'input_path': os.path.abspath(input_path),
+            'expires': time.time() + self.lease_ttl,
+        }
+    
+    def is_done(self, input_path):
+        """Whether any worker has finished the job."""
+        return os.path.exists(self._done_path(input_path))
+    
+    def try_claim(self, input_path):
+        """
+        Try to take the lease for a job.
+        
+        Returns:
+            bool: True if this worker now holds the lease, False if the job is
+                done or leased by a live worker.
+        """
+        if self.is_done(input_path):
+            return False
+        
+        lease_path = self._lease_path(input_path)
+        lease = self._read_json(lease_path)
+        if lease is None and os.path.exists(lease_path):
+            # Unreadable lease; treat it as expired once it is older than the TTL
+            try:
+                lease = {'token': None, 'expires': os.path.getmtime(lease_path) + self.lease_ttl}
+            except OSError:
+                pass
+        if lease is not None and lease.get('expires', 0) > time.time():
+            return False
+        
+        if lease is not None:
+            # The holder stopped sending heartbeats; move its lease aside.
+            # Only one worker's rename can succeed.
+            stale_path = f"{lease_path}.stale-{uuid.uuid4().hex}"
+            try:
+                os.rename(lease_path, stale_path)
+            except OSError:
+                return False
+            
+            stale = self._read_json(stale_path)
+            if stale is not None and (stale.get('token') != lease.get('token')
+                                      or stale.get('expires', 0) > time.time()):
+                # The lease was renewed or reclaimed in between; put it back
+                try:
+                    os.link(stale_path, lease_path)
+                except OSError:
+                    pass
+                os.unlink(stale_path)
+                return False
+            
+            os.unlink(stale_path)
+            logger.warning(f"回收过期租约: {input_path} (原持有者 {lease.get('worker_id')})")
+        
+        token = uuid.uuid4().hex
+        temp_path = self._write_temp(self._new_lease(input_path, token))
+        try:
+            os.link(temp_path, lease_path)
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(temp_path)
+        
+        # A job can finish between the done check and the claim
+        if self.is_done(input_path):
+            self.release(input_path)
+            return False
+        
+        self._tokens[self._job_id(input_path)] = token
+        return True
+    
+    def holds(self, input_path):
+        """Whether the lease file still carries this worker's token."""
+        token = self._tokens.get(self._job_id(input_path))
+        lease = self._read_json(self._lease_path(input_path))
+        return token is not None and lease is not None and lease.get('token') == token
+    
+    def renew(self, input_path):
+        """
+        Extend the lease of a job held by this worker.
+        
+        Returns:
+            bool: False if the lease was lost to another worker.
+        """
+        if not self.holds(input_path):
+            return False
+        
+        token = self._tokens[self._job_id(input_path)]
+        temp_path = self._write_temp(self._new_lease(input_path, token))
+        os.replace(temp_path, self._lease_path(input_path))
+        return True
+    
+    def release(self, input_path):
+        """Give up the lease of a job held by this worker."""
+        if self.holds(input_path):
+            try:
+                os.unlink(self._lease_path(input_path))
+            except OSError:
+                pass
+        self._tokens.pop(self._job_id(input_path), None)
+    
+    def mark_done(self, input_path, output_path, success):
+        """Record the outcome of a job so no other worker picks it up."""
+        temp_path = self._write_temp({
+            'worker_id': self.worker_id,
+            'input_path': os.path.abspath(input_path),
+            'output_path': os.path.abspath(output_path),
+            'success': success,
+            'finished': time.time(),
+        })
+        os.replace(temp_path, self._done_path(input_path))
+
+def _run_leased_job(work_queue, converter, input_file, output_file, heartbeat_interval,
+                    embed_thumbnails=False):
+    """Convert one claimed file while a heartbeat thread keeps its lease alive."""
+    cancel_token = CancellationToken()
+    stop_heartbeat = threading.Event()
+    
+    def heartbeat():
+        while not stop_heartbeat.wait(heartbeat_interval):
+            if not work_queue.renew(input_file):
+                logger.error(f"租约已丢失，停止转换: {input_file}")
+                cancel_token.cancel()
+                return
+    
+    # Convert to a private name and publish with an atomic rename, so readers
+    # never see a partial PDF and a worker that lost its lease publishes nothing.
+    # The name starts with the job id, so it never matches another input's job.
+    temp_prefix = os.path.join(os.path.dirname(output_file), f".{work_queue._job_id(input_file)}.")
+    temp_output = f"{temp_prefix}{work_queue.worker_id}.tmp"
+    
+    # Temp files of this job were left by a worker that died or lost its
+    # lease; this worker holds the lease now, so nobody else will publish them
+    for orphan in glob.glob(glob.escape(temp_prefix) + '*'):
+        try:
+            os.unlink(orphan)
+            logger.info(f"删除遗留的临时文件: {orphan}")
+        except OSError as e:
+            logger.warning(f"无法删除遗留的临时文件 {orphan}: {e}")
+    
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+    try:
+        success = converter.convert(input_file, temp_output, embed_thumbnails,
+                                    cancel_token=cancel_token)
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+    
+    try:
+        if cancel_token.cancelled or not work_queue.holds(input_file):
+            return None
+        
+        if success:
+            os.replace(temp_output, output_file)
+            logger.info(f"已发布: {output_file}")
+        work_queue.mark_done(input_file, output_file, success)
+        return success
+    finally:
+        if os.path.exists(temp_output):
+            os.unlink(temp_output)
+        work_queue.release(input_file)
+
+# Function for multi-host batch conversion
+def distributed_batch_convert(input_files, queue_dir, output_dir=None, worker_id=None,
+                              lease_ttl=DEFAULT_LEASE_TTL,
+                              heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL,
+                              poll_interval=None, embed_thumbnails=False):
+    """
+    Convert files as one of several workers sharing a queue directory.
+    
+    Every worker is started with the same input files and queue directory,
+    e.g. on shared storage. Workers claim files through leases, so each file
+    is converted once; files whose worker died are reclaimed once its lease
+    expires. The call returns when every file has been finished by some worker.
+    
+    Args:
+        input_files (list): List of paths to CBZ/CBR files.
+        queue_dir (str): Shared directory holding leases and done markers.
+        output_dir (str, optional): Directory for output PDF files.
+            If not provided, PDFs will be created in the same directory as input files.
+        worker_id (str, optional): Name of this worker in leases and logs.
+        lease_ttl (float, optional): Seconds a lease stays valid without a heartbeat.
+        heartbeat_interval (float, optional): Seconds between lease renewals.
+        poll_interval (float, optional): Seconds to wait when all remaining
+            files are leased by other workers. Defaults to a quarter of lease_ttl.
+        embed_thumbnails (bool, optional): Embed a /Thumb image in every page.
+    
+    Returns:
+        dict: Dictionary with the input file paths converted by this worker
+            as keys and conversion status as values.
+    """
+    if heartbeat_interval >= lease_ttl:
+        raise ValueError("heartbeat_interval must be shorter than lease_ttl")
+    if poll_interval is None:
+        poll_interval = lease_ttl / 4
+    
+    work_queue = WorkQueue(queue_dir, worker_id, lease_ttl)
+    converter = CBZtoPDFConverter()
+    results = {}
+    logger.info(f"工作进程 {work_queue.worker_id} 启动，队列目录: {queue_dir}")
+    
+    while True:
+        pending = [f for f in input_files if not work_queue.is_done(f)]
+        if not pending:
+            break
+        
+        claimed_any = False
+        for input_file in pending:
+            if not work_queue.try_claim(input_file):
+                continue
+            
+            claimed_any = True
+            output_file = _get_output_path(input_file, output_dir)
+            logger.info(f"Worker {work_queue.worker_id} converting {input_file} to {output_file}")
+            success = _run_leased_job(work_queue, converter, input_file, output_file,
+                                      heartbeat_interval, embed_thumbnails)
+            if success is not None:
+                results[input_file] = success
+        
+        if not claimed_any:
+            # Everything left is leased by other workers; wait for them to
+            # finish or for their leases to expire
+            time.sleep(poll_interval)
+    
+    logger.info(f"工作进程 {work_queue.worker_id} 完成，处理了 {len(results)} 个文件")
+    return results
+
+def _parse_size(value):
+    """Parse a WIDTHxHEIGHT command line argument."""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+        return (width, height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value} (expected WIDTHxHEIGHT)")
+
+def _parse_quality(value):
+    """Parse an encoder quality command line argument."""
+    try:
+        quality = int(value)
+    except ValueError:
+        quality = None
+    if quality is None or not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError(f"invalid quality: {value} (expected 1-100)")
+    return quality
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="CBZ/CBR to PDF converter")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    convert_parser = subparsers.add_parser('convert', help="convert CBZ/CBR files to PDF")
+    convert_parser.add_argument('input_files', nargs='+')
+    convert_parser.add_argument('-o', '--output-dir')
+    convert_parser.add_argument('--embed-thumbnails', action='store_true',
+                                help="embed a /Thumb image in every PDF page")
+    convert_parser.add_argument('--validate', action='store_true',
+                                help="pre-scan archives and skip invalid ones")
+    
+    thumbnails_parser = subparsers.add_parser('thumbnails', help="write cover thumbnails to a cache directory")
+    thumbnails_parser.add_argument('input_files', nargs='+')
+    thumbnails_parser.add_argument('-d', '--cache-dir', required=True)
+    thumbnails_parser.add_argument('-s', '--size', type=_parse_size, default=DEFAULT_THUMBNAIL_SIZE,
+                                   help="bounding box as WIDTHxHEIGHT (default: 256x256)")
+    thumbnails_parser.add_argument('--max-cache-mb', type=int,
+                                   default=DEFAULT_THUMBNAIL_CACHE_BYTES // (1024 * 1024))
+    thumbnails_parser.add_argument('-j', '--jobs', type=int, default=None)
+    
+    worker_parser = subparsers.add_parser('worker', help="convert files as one of several workers sharing a queue directory")
+    worker_parser.add_argument('input_files', nargs='+')
+    worker_parser.add_argument('-q', '--queue-dir', required=True)
+    worker_parser.add_argument('-o', '--output-dir')
+    worker_parser.add_argument('--worker-id')
+    worker_parser.add_argument('--lease-ttl', type=float, default=DEFAULT_LEASE_TTL)
+    worker_parser.add_argument('--heartbeat', type=float, default=DEFAULT_HEARTBEAT_INTERVAL)
+    worker_parser.add_argument('--embed-thumbnails', action='store_true')
+    
+    omnibus_parser = subparsers.add_parser('omnibus', help="merge CBZ/CBR/PDF volumes into one PDF without re-encoding")
+    omnibus_parser.add_argument('input_files', nargs='+', help="volumes in reading order")
+    omnibus_parser.add_argument('-o', '--output', required=True)
+    omnibus_parser.add_argument('-t', '--title', action='append', dest='titles',
+                                help="outline title of a volume; repeat once per volume")
+    
+    validate_parser = subparsers.add_parser('validate', help="check archives for corrupt or truncated images")
+    validate_parser.add_argument('input_files', nargs='+')
+    validate_parser.add_argument('-r', '--report', help="write the JSON report to this file instead of stdout")
+    validate_parser.add_argument('--quarantine-dir', help="move invalid archives to this directory")
+    validate_parser.add_argument('--all-errors', action='store_true',
+                                 help="check every member instead of stopping at the first error per archive")
+    validate_parser.add_argument('-j', '--jobs', type=int, default=None)
+    
+    pdf2cbz_parser = subparsers.add_parser('pdf2cbz', help="extract the page images of image-only PDFs into CBZ files")
+    pdf2cbz_parser.add_argument('input_files', nargs='+')
+    pdf2cbz_parser.add_argument('-o', '--output-dir')
+    
+    optimize_parser = subparsers.add_parser('optimize', help="re-encode archive pages to WebP or optimized JPEG")
+    optimize_parser.add_argument('input_files', nargs='+')
+    optimize_parser.add_argument('-o', '--output-dir', help="write optimized CBZ files here instead of in place")
+    optimize_parser.add_argument('-f', '--format', choices=sorted(OPTIMIZE_EXTENSIONS), default=DEFAULT_OPTIMIZE_FORMAT)
+    optimize_parser.add_argument('-q', '--quality', type=_parse_quality, default=DEFAULT_OPTIMIZE_QUALITY)
+    optimize_parser.add_argument('-j', '--jobs', type=int, default=None)
+    optimize_parser.add_argument('--reencode-lossy', action='store_true',
+                                 help="also re-encode JPEG and lossy WebP pages (adds another lossy generation)")
+    
+    args = parser.parse_args(argv)
+    
+    if getattr(args, 'output_dir', None):
+        os.makedirs(args.output_dir, exist_ok=True)
+    
+    if args.command == 'convert':
+        results = batch_convert(args.input_files, args.output_dir, embed_thumbnails=args.embed_thumbnails,
+                                validate=args.validate)
+        return 0 if all(results.values()) else 1
+    
+    if args.command == 'worker':
+        results = distributed_batch_convert(args.input_files, args.queue_dir, args.output_dir,
+                                            args.worker_id, args.lease_ttl, args.heartbeat,
+                                            embed_thumbnails=args.embed_thumbnails)
+        return 0 if all(results.values()) else 1
+    
+    if args.command == 'optimize':
+        results = optimize_archives(args.input_files, args.output_dir, args.format, args.quality, args.jobs,
+                                    args.reencode_lossy)
+        total_saved = 0
+        for input_file, report in results.items():
+            if report is None:
+                print(f"{input_file}\tFAILED")
+                continue
+            total_saved += report['bytes_saved']
+            print(f"{input_file}\t{report['bytes_before']} -> {report['bytes_after']} bytes"
+                  f"\tsaved {report['bytes_saved']}\t{report['pages_recompressed']}/{report['pages']} pages re-encoded")
+        print(f"Total saved: {total_saved} bytes")
+        return 0 if all(results.values()) else 1
+    
+    if args.command == 'pdf2cbz':
+        converter = PDFtoCBZConverter()
+        results = [converter.convert(input_file, _get_output_path(input_file, args.output_dir, '.cbz'))
+                   for input_file in args.input_files]
+        return 0 if all(results) else 1
+    
+    if args.command == 'validate':
+        report = validate_archives(args.input_files, args.jobs, not args.all_errors, args.quarantine_dir)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        else:
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if report['invalid'] == 0 else 1
+    
+    if args.command == 'omnibus':
+        success = CBZtoPDFConverter().create_omnibus(args.input_files, args.output, args.titles)
+        return 0 if success else 1
+    
+    if args.command == 'thumbnails':
+        results = generate_thumbnails(args.input_files, args.cache_dir, args.size,
+                                      args.max_cache_mb * 1024 * 1024, args.jobs)
+        for input_file, thumbnail in results.items():
+            print(f"{input_file}\t{thumbnail or 'FAILED'}")
+        return 0 if all(results.values()) else 1
+    
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,11 @@ import os
 import sys
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+import queue
 import logging
 import traceback
-from converter import CBZtoPDFConverter, batch_convert
+from converter import CBZtoPDFConverter, CancellationToken, batch_convert
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,6 +22,11 @@ try:
 except Exception as e:
     print(f"无法设置日志文件: {e}")
 
+# Default number of books converted in parallel
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# Interval in milliseconds at which the Tk main loop drains the UI queue
+UI_POLL_INTERVAL_MS = 100
+
 class CBZtoPDFApp:
     """
     GUI application for converting CBZ files to PDF.
@@ -53,10 +59,21 @@ class CBZtoPDFApp:
         self.output_directory = tk.StringVar()
         self.status_var = tk.StringVar(value="Ready")
         self.progress_var = tk.DoubleVar(value=0)
+        self.worker_count = tk.IntVar(value=DEFAULT_WORKERS)
         self.is_converting = False
+        self.cancel_token = None
+        self.executor = None
+        self.job_progress = {}
+        self.successful = 0
+        self.failed = 0
+        
+        # Worker threads never touch Tk directly; they post messages here and
+        # the main loop applies them in _process_ui_queue
+        self.ui_queue = queue.Queue()
         
         # Create UI
         self._create_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
     
     def _create_ui(self):
         """Create the user interface."""
@@ -72,17 +89,24 @@ class CBZtoPDFApp:
         input_frame = ttk.LabelFrame(main_frame, text="Input Files", padding="10")
         input_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        # Files listbox with scrollbar
+        # Files list with one progress and status row per file
         files_frame = ttk.Frame(input_frame)
         files_frame.pack(fill=tk.BOTH, expand=True)
         
         scrollbar = ttk.Scrollbar(files_frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        self.files_listbox = tk.Listbox(files_frame, selectmode=tk.EXTENDED, yscrollcommand=scrollbar.set)
-        self.files_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.files_tree = ttk.Treeview(files_frame, columns=("progress", "status"),
+                                       selectmode=tk.EXTENDED, yscrollcommand=scrollbar.set)
+        self.files_tree.heading("#0", text="File")
+        self.files_tree.heading("progress", text="Progress")
+        self.files_tree.heading("status", text="Status")
+        self.files_tree.column("#0", width=280)
+        self.files_tree.column("progress", width=70, anchor=tk.E)
+        self.files_tree.column("status", width=180)
+        self.files_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        scrollbar.config(command=self.files_listbox.yview)
+        scrollbar.config(command=self.files_tree.yview)
         
         # Buttons for file selection
         files_button_frame = ttk.Frame(input_frame)
@@ -107,9 +131,22 @@ class CBZtoPDFApp:
         browse_button = ttk.Button(output_frame, text="Browse", command=self._browse_output)
         browse_button.pack(side=tk.RIGHT, padx=5)
         
-        # Convert button
-        convert_button = ttk.Button(main_frame, text="Convert", command=self._start_conversion)
-        convert_button.pack(pady=10)
+        # Convert and cancel buttons
+        action_frame = ttk.Frame(main_frame)
+        action_frame.pack(pady=10)
+        
+        workers_label = ttk.Label(action_frame, text="Parallel jobs:")
+        workers_label.pack(side=tk.LEFT, padx=5)
+        
+        workers_spinbox = ttk.Spinbox(action_frame, from_=1, to=max(os.cpu_count() or 1, 1) * 2,
+                                      width=4, textvariable=self.worker_count)
+        workers_spinbox.pack(side=tk.LEFT, padx=5)
+        
+        convert_button = ttk.Button(action_frame, text="Convert", command=self._start_conversion)
+        convert_button.pack(side=tk.LEFT, padx=5)
+        
+        cancel_button = ttk.Button(action_frame, text="Cancel", command=self._cancel_conversion)
+        cancel_button.pack(side=tk.LEFT, padx=5)
         
         # Progress bar
         progress_frame = ttk.Frame(main_frame)
@@ -128,6 +165,10 @@ class CBZtoPDFApp:
     
     def _add_files(self):
         """Add files to the list."""
+        if self.is_converting:
+            messagebox.showwarning("In Progress", "Files cannot be added while a conversion is running.")
+            return
+        
         filetypes = [
             ("Comic Book Archives", "*.cbz *.cbr"),
             ("CBZ Files", "*.cbz"),
@@ -144,28 +185,34 @@ class CBZtoPDFApp:
             for file in files:
                 if file not in self.input_files:
                     self.input_files.append(file)
-                    self.files_listbox.insert(tk.END, os.path.basename(file))
+                    self.files_tree.insert("", tk.END, iid=file, text=os.path.basename(file),
+                                           values=("", "Pending"))
             
             self.status_var.set(f"{len(self.input_files)} files selected")
     
     def _remove_selected(self):
         """Remove selected files from the list."""
-        selected_indices = self.files_listbox.curselection()
+        if self.is_converting:
+            return
+        
+        selected_files = self.files_tree.selection()
         
-        if not selected_indices:
+        if not selected_files:
             return
         
-        # Remove in reverse order to avoid index shifting
-        for index in sorted(selected_indices, reverse=True):
-            del self.input_files[index]
-            self.files_listbox.delete(index)
+        for file in selected_files:
+            self.input_files.remove(file)
+            self.files_tree.delete(file)
         
         self.status_var.set(f"{len(self.input_files)} files selected")
     
     def _clear_files(self):
         """Clear all files from the list."""
+        if self.is_converting:
+            return
+        
         self.input_files = []
-        self.files_listbox.delete(0, tk.END)
+        self.files_tree.delete(*self.files_tree.get_children())
         self.status_var.set("Ready")
     
     def _browse_output(self):
@@ -196,76 +243,191 @@ class CBZtoPDFApp:
                 messagebox.showerror("Error", f"Could not create output directory: {e}")
                 return
         
-        # Start conversion in a separate thread
+        # Jobs run in parallel, so two inputs must never write the same PDF
+        output_owners = {}
+        collisions = []
+        for input_file in self.input_files:
+            output_file = self._get_output_file(input_file, output_dir)
+            key = os.path.normcase(os.path.abspath(output_file))
+            if key in output_owners:
+                collisions.append(f"{output_owners[key]} / {input_file} -> {output_file}")
+            else:
+                output_owners[key] = input_file
+        if collisions:
+            logger.error(f"多个文件的输出路径相同: {collisions}")
+            messagebox.showwarning("Duplicate Output",
+                                   "These files would be written to the same PDF:\n" + "\n".join(collisions))
+            return
+        
+        try:
+            worker_count = max(1, int(self.worker_count.get()))
+        except (tk.TclError, ValueError):
+            worker_count = DEFAULT_WORKERS
+        
+        # Submit every file to the worker pool
         self.is_converting = True
-        logger.info(f"开始转换 {len(self.input_files)} 个文件")
+        self.cancel_token = CancellationToken()
+        self.job_progress = {input_file: 0.0 for input_file in self.input_files}
+        self.successful = 0
+        self.failed = 0
+        logger.info(f"开始转换 {len(self.input_files)} 个文件，并行数: {worker_count}")
         self.progress_var.set(0)
-        conversion_thread = Thread(target=self._run_conversion, args=(output_dir,))
-        conversion_thread.daemon = True
-        conversion_thread.start()
+        self.status_var.set(f"Converting {len(self.input_files)} files with {worker_count} workers")
+        
+        for input_file in self.input_files:
+            self.files_tree.set(input_file, "progress", "0%")
+            self.files_tree.set(input_file, "status", "Queued")
+        
+        self.executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="cbz2pdf")
+        for input_file in self.input_files:
+            future = self.executor.submit(self._convert_job, input_file, output_dir, self.cancel_token)
+            future.add_done_callback(
+                lambda future, input_file=input_file: self._on_job_done(input_file, future))
+        
+        # Let running jobs finish in the background; the UI queue reports them
+        self.executor.shutdown(wait=False)
+        self.root.after(UI_POLL_INTERVAL_MS, self._process_ui_queue)
     
-    def _run_conversion(self, output_dir):
-        """Run the conversion process in a separate thread."""
-        try:
-            total_files = len(self.input_files)
-            successful = 0
-            failed = 0
-            
-            logger.info(f"开始批量转换，共 {total_files} 个文件")
+    def _cancel_conversion(self):
+        """Cancel queued jobs and stop running ones after the current page."""
+        if not self.is_converting or self.cancel_token is None:
+            return
+        
+        logger.info("用户请求取消转换")
+        self.cancel_token.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.status_var.set("Cancelling...")
+    
+    def _on_close(self):
+        """Stop queued and running jobs before closing the window."""
+        if self.is_converting:
+            if not messagebox.askokcancel("Conversion Running",
+                                          "Conversion is still running. Cancel it and exit?"):
+                return
             
-            for i, input_file in enumerate(self.input_files):
-                # Update status
-                file_name = os.path.basename(input_file)
-                status_msg = f"Converting {file_name} ({i+1}/{total_files})"
-                logger.info(status_msg)
-                self.status_var.set(status_msg)
+            # Without this the executor threads keep converting the rest of
+            # the queue after the window is gone
+            logger.info("关闭窗口，取消正在进行的转换")
+            self.cancel_token.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+    
+    def _format_eta(self, seconds):
+        """Format an ETA in seconds as M:SS."""
+        if seconds is None:
+            return "--:--"
+        minutes, seconds = divmod(int(seconds), 60)
+        return f"{minutes}:{seconds:02d}"
+    
+    def _get_output_file(self, input_file, output_dir):
+        """Get the PDF path for an input file."""
+        if output_dir:
+            return os.path.join(output_dir, os.path.splitext(os.path.basename(input_file))[0] + '.pdf')
+        return os.path.splitext(input_file)[0] + '.pdf'
+    
+    def _convert_job(self, input_file, output_dir, cancel_token):
+        """Convert one file on a worker thread, reporting through the UI queue."""
+        output_file = self._get_output_file(input_file, output_dir)
+        
+        logger.info(f"转换文件: {input_file} -> {output_file}")
+        self.ui_queue.put(('progress', input_file, 0.0, "Starting"))
+        
+        def on_progress(info):
+            if info['stage'] == 'write':
+                status = "Writing PDF"
+            else:
+                stage = "Extracting" if info['stage'] == 'extract' else "Page"
+                status = f"{stage} {info['current']}/{info['total']}, ETA {self._format_eta(info['eta'])}"
+            self.ui_queue.put(('progress', input_file, info['fraction'], status))
+        
+        converter = CBZtoPDFConverter()
+        return converter.convert(input_file, output_file,
+                                 progress_callback=on_progress,
+                                 cancel_token=cancel_token)
+    
+    def _on_job_done(self, input_file, future):
+        """Post the outcome of a finished, failed or cancelled job."""
+        file_name = os.path.basename(input_file)
+        
+        if future.cancelled():
+            outcome = 'cancelled'
+        elif future.exception() is not None:
+            error = future.exception()
+            logger.error(f"处理文件 {file_name} 时出错: {error}")
+            logger.error("".join(traceback.format_exception(type(error), error, error.__traceback__)))
+            outcome = 'failed'
+        elif future.result():
+            logger.info(f"文件 {file_name} 转换成功")
+            outcome = 'done'
+        elif self.cancel_token.cancelled:
+            logger.info(f"文件 {file_name} 转换已取消")
+            outcome = 'cancelled'
+        else:
+            logger.error(f"文件 {file_name} 转换失败")
+            outcome = 'failed'
+        
+        self.ui_queue.put((outcome, input_file))
+    
+    def _process_ui_queue(self):
+        """Apply queued worker updates to the UI; runs on the Tk main loop."""
+        try:
+            while True:
+                message = self.ui_queue.get_nowait()
+                kind, input_file = message[0], message[1]
                 
-                # Convert file
-                try:
-                    converter = CBZtoPDFConverter()
-                    
-                    if output_dir:
-                        output_file = os.path.join(output_dir, os.path.splitext(file_name)[0] + '.pdf')
-                    else:
-                        output_file = os.path.splitext(input_file)[0] + '.pdf'
-                    
-                    logger.info(f"转换文件: {input_file} -> {output_file}")
-                    success = converter.convert(input_file, output_file)
-                    
-                    if success:
-                        logger.info(f"文件 {file_name} 转换成功")
-                        successful += 1
-                    else:
-                        logger.error(f"文件 {file_name} 转换失败")
-                        failed += 1
-                except Exception as e:
-                    logger.error(f"处理文件 {file_name} 时出错: {e}")
-                    logger.error(traceback.format_exc())
-                    failed += 1
+                if kind == 'progress':
+                    fraction, status = message[2], message[3]
+                    self.job_progress[input_file] = fraction
+                    self.files_tree.set(input_file, "progress", f"{fraction * 100:.0f}%")
+                    self.files_tree.set(input_file, "status", status)
+                    continue
                 
-                # Update progress
-                progress = ((i + 1) / total_files) * 100
-                self.progress_var.set(progress)
-            
-            # Show completion message
-            completion_msg = f"Converted {successful} of {total_files} files successfully."
-            if failed > 0:
-                completion_msg += f" {failed} files failed."
-            
-            logger.info(f"转换完成: {successful} 成功, {failed} 失败")
-            self.root.after(0, lambda: messagebox.showinfo("Conversion Complete", completion_msg))
-            self.status_var.set(f"Completed: {successful}/{total_files} successful")
+                self.job_progress.pop(input_file, None)
+                if kind == 'done':
+                    self.successful += 1
+                    self.files_tree.set(input_file, "progress", "100%")
+                    self.files_tree.set(input_file, "status", "Done")
+                elif kind == 'failed':
+                    self.failed += 1
+                    self.files_tree.set(input_file, "status", "Failed")
+                else:
+                    self.files_tree.set(input_file, "status", "Cancelled")
+        except queue.Empty:
+            pass
+        
+        total_files = len(self.input_files)
+        finished = total_files - len(self.job_progress)
+        if total_files:
+            overall = (finished + sum(self.job_progress.values())) / total_files
+            self.progress_var.set(overall * 100)
+        
+        if self.job_progress:
+            if not self.cancel_token.cancelled:
+                self.status_var.set(f"Converting: {finished}/{total_files} finished")
+            self.root.after(UI_POLL_INTERVAL_MS, self._process_ui_queue)
+            return
         
-        except Exception as e:
-            error_msg = f"An error occurred during conversion: {e}"
-            logger.error(error_msg)
-            logger.error(traceback.format_exc())
-            self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
-            self.status_var.set("Error occurred")
-        
-        finally:
-            self.is_converting = False
-            logger.info("转换线程结束")
+        self._finish_conversion(total_files)
+    
+    def _finish_conversion(self, total_files):
+        """Report the outcome once every job has finished."""
+        self.is_converting = False
+        self.executor = None
+        successful, failed = self.successful, self.failed
+        
+        if self.cancel_token.cancelled:
+            logger.info(f"转换已取消: {successful} 成功, {failed} 失败")
+            self.status_var.set(f"Cancelled: {successful}/{total_files} successful")
+            return
+        
+        # Show completion message
+        completion_msg = f"Converted {successful} of {total_files} files successfully."
+        if failed > 0:
+            completion_msg += f" {failed} files failed."
+        
+        logger.info(f"转换完成: {successful} 成功, {failed} 失败")
+        self.status_var.set(f"Completed: {successful}/{total_files} successful")
+        messagebox.showinfo("Conversion Complete", completion_msg)
 
 def main():
     """Main entry point for the application."""
@@ -273,6 +435,9 @@ def main():
         logger.info("启动应用程序")
         root = tk.Tk()
         app = CBZtoPDFApp(root)
+        if os.environ.get('CBZ2PDF_STARTUP_PROBE'):
+            # Used by bench_startup.py: exit as soon as the first window is drawn
+            root.after_idle(root.destroy)
         root.mainloop()
         logger.info("应用程序关闭")
     except Exception as e:
@@ -0,0 +1,41 @@
+import io
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+import zipfile
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python_app")
+sys.path.insert(0, APP_DIR)
+
+CONVERTER_SCRIPT = os.path.join(APP_DIR, "converter.py")
+
+# converter.py opens cbz2pdf_conversion.log in the working directory on import;
+# import it from a scratch directory so test runs leave no log in the repo
+LOG_DIR = tempfile.mkdtemp(prefix="cbz2pdf_tests_")
+atexit.register(shutil.rmtree, LOG_DIR, ignore_errors=True)
+_original_cwd = os.getcwd()
+os.chdir(LOG_DIR)
+try:
+    import converter  # noqa: F401
+finally:
+    os.chdir(_original_cwd)
+
+@pytest.fixture
+def make_cbz():
+    """Return a function that writes a CBZ with generated pages."""
+    from PIL import Image
+    
+    def make(path, pages=3, image_format='JPEG', size=(300, 400)):
+        extension = {'JPEG': '.jpg', 'PNG': '.png'}[image_format]
+        with zipfile.ZipFile(path, 'w') as zip_ref:
+            for index in range(1, pages + 1):
+                buffer = io.BytesIO()
+                Image.effect_noise(size, 40).convert('RGB').save(buffer, image_format)
+                zip_ref.writestr(f"page{index}{extension}", buffer.getvalue())
+        return str(path)
+    
+    return make
@@ -0,0 +1,46 @@
+import zipfile
+
+from PyPDF2 import PdfReader
+
+from converter import CBZtoPDFConverter
+
+def _dct_streams(reader):
+    """Return the raw data of the DCTDecode image on every page that has one."""
+    streams = []
+    for page in reader.pages:
+        for image in page['/Resources']['/XObject'].values():
+            image = image.get_object()
+            if image.get('/Filter') == '/DCTDecode':
+                streams.append(image.get_data())
+    return streams
+
+def test_omnibus_is_valid_and_keeps_jpeg_bytes(tmp_path, make_cbz):
+    jpeg_cbz = make_cbz(tmp_path / "vol1.cbz", pages=3)
+    png_cbz = make_cbz(tmp_path / "vol2.cbz", pages=2, image_format='PNG')
+    source_pdf = str(tmp_path / "vol3.pdf")
+    converter = CBZtoPDFConverter()
+    assert converter.convert(make_cbz(tmp_path / "vol3.cbz", pages=4), source_pdf)
+    
+    output_pdf = tmp_path / "omnibus.pdf"
+    assert converter.create_omnibus([jpeg_cbz, png_cbz, source_pdf], str(output_pdf),
+                                    ["Volume 1", "Volume 2", "Volume 3"])
+    
+    with open(output_pdf, 'rb') as f:
+        assert f.read(8) == b'%PDF-1.5'
+        reader = PdfReader(f, strict=True)
+        assert len(reader.pages) == 9
+        
+        outline = [(item.title, reader.get_destination_page_number(item)) for item in reader.outline]
+        assert outline == [("Volume 1", 0), ("Volume 2", 3), ("Volume 3", 5)]
+        
+        with zipfile.ZipFile(jpeg_cbz) as zip_ref:
+            jpeg_members = [zip_ref.read(f"page{index}.jpg") for index in range(1, 4)]
+        with open(source_pdf, 'rb') as source:
+            source_streams = _dct_streams(PdfReader(source))
+        assert len(source_streams) == 4
+        assert _dct_streams(reader) == jpeg_members + source_streams
+
+def test_omnibus_rejects_empty_input(tmp_path):
+    output_pdf = tmp_path / "omnibus.pdf"
+    assert not CBZtoPDFConverter().create_omnibus([], str(output_pdf))
+    assert not output_pdf.exists()
@@ -0,0 +1,71 @@
+import io
+import zipfile
+
+import pytest
+from PIL import Image, ImageFilter
+
+from converter import CBZtoPDFConverter, main
+
+def _photo(image_format, **params):
+    """Encode a smooth, photo-like page that WebP compresses far better than PNG."""
+    buffer = io.BytesIO()
+    img = Image.effect_noise((400, 600), 40).convert('RGB').filter(ImageFilter.GaussianBlur(2))
+    img.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+def _write_cbz(path, members, compression=zipfile.ZIP_STORED):
+    with zipfile.ZipFile(path, 'w', compression) as zip_ref:
+        for name, data in members.items():
+            zip_ref.writestr(name, data)
+    return str(path)
+
+def test_only_lossless_pages_are_reencoded_by_default(tmp_path):
+    jpeg = _photo('JPEG', quality=95)
+    input_cbz = _write_cbz(tmp_path / "book.cbz", {"1.png": _photo('PNG'), "2.jpg": jpeg,
+                                                    "ComicInfo.xml": b"<ComicInfo/>"})
+    output_cbz = str(tmp_path / "out.cbz")
+    
+    report = CBZtoPDFConverter().optimize_archive(input_cbz, output_cbz)
+    
+    assert report['pages'] == 2
+    assert report['pages_recompressed'] == 1
+    assert report['bytes_saved'] > 0
+    with zipfile.ZipFile(output_cbz) as zip_ref:
+        assert sorted(zip_ref.namelist()) == ["1.webp", "2.jpg", "ComicInfo.xml"]
+        assert zip_ref.read("2.jpg") == jpeg
+        assert Image.open(io.BytesIO(zip_ref.read("1.webp"))).format == 'WEBP'
+    
+    report = CBZtoPDFConverter().optimize_archive(input_cbz, str(tmp_path / "lossy.cbz"), reencode_lossy=True)
+    assert report['pages_recompressed'] == 2
+
+def test_in_place_run_keeps_original_when_not_smaller(tmp_path):
+    # The text member deflates to almost nothing but is stored in the output,
+    # so the rewritten archive is larger even though the page shrinks
+    input_cbz = _write_cbz(tmp_path / "book.cbz", {"1.png": _photo('PNG'), "notes.txt": b"a" * 4_000_000},
+                           zipfile.ZIP_DEFLATED)
+    with open(input_cbz, 'rb') as f:
+        original = f.read()
+    
+    report = CBZtoPDFConverter().optimize_archive(input_cbz)
+    
+    assert report['bytes_saved'] == 0
+    assert report['pages_recompressed'] == 0
+    with open(input_cbz, 'rb') as f:
+        assert f.read() == original
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["book.cbz"]
+
+def test_existing_output_is_not_overwritten(tmp_path):
+    input_cbr = _write_cbz(tmp_path / "book.cbr", {"1.png": _photo('PNG')})
+    existing_cbz = tmp_path / "book.cbz"
+    existing_cbz.write_bytes(b"another book")
+    
+    assert CBZtoPDFConverter().optimize_archive(input_cbr) is None
+    assert existing_cbz.read_bytes() == b"another book"
+
+@pytest.mark.parametrize("quality", [0, 101, 500])
+def test_out_of_range_quality_is_rejected(tmp_path, quality):
+    input_cbz = _write_cbz(tmp_path / "book.cbz", {"1.png": _photo('PNG')})
+    assert CBZtoPDFConverter().optimize_archive(input_cbz, str(tmp_path / "out.cbz"), quality=quality) is None
+    with pytest.raises(SystemExit) as excinfo:
+        main(['optimize', input_cbz, '-q', str(quality)])
+    assert excinfo.value.code == 2
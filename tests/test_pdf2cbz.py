@@ -0,0 +1,83 @@
+import io
+import zlib
+import zipfile
+
+import pytest
+from PIL import Image
+
+from converter import PDFtoCBZConverter, _StreamingPdfWriter
+
+def _paeth(left, up, up_left):
+    estimate = left + up - up_left
+    distances = (abs(estimate - left), abs(estimate - up), abs(estimate - up_left))
+    if distances[0] <= distances[1] and distances[0] <= distances[2]:
+        return left
+    return up if distances[1] <= distances[2] else up_left
+
+def _png_predict(raw, row_length, bytes_per_pixel):
+    """Apply PNG predictors to raw rows, cycling through all five filter types."""
+    output = bytearray()
+    previous = bytes(row_length)
+    for index, start in enumerate(range(0, len(raw), row_length)):
+        row = raw[start:start + row_length]
+        filter_type = index % 5
+        output.append(filter_type)
+        for i, value in enumerate(row):
+            left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            up_left = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            prediction = (0, left, previous[i], (left + previous[i]) // 2,
+                          _paeth(left, previous[i], up_left))[filter_type]
+            output.append((value - prediction) & 0xFF)
+        previous = row
+    return bytes(output)
+
+def _write_predictor_pdf(path, img, extra_entries=b""):
+    """Write a one-page PDF with img stored as Flate data with PNG predictor 15."""
+    width, height = img.size
+    colors = {'L': 1, 'RGB': 3, 'P': 1}[img.mode]
+    if img.mode == 'P':
+        palette = img.getpalette()[:3 * 256]
+        color_space = b"[/Indexed /DeviceRGB 255 <" + bytes(palette).hex().encode('ascii') + b">]"
+    else:
+        color_space = b"/DeviceRGB" if img.mode == 'RGB' else b"/DeviceGray"
+    
+    data = zlib.compress(_png_predict(img.tobytes(), width * colors, colors))
+    entries = (b"/ColorSpace " + color_space + b" /BitsPerComponent 8 /Filter /FlateDecode"
+               b" /DecodeParms <</Predictor 15 /Colors %d /Columns %d>>" % (colors, width) + extra_entries)
+    with open(path, 'wb') as f:
+        writer = _StreamingPdfWriter(f)
+        writer.begin_volume("test")
+        writer.add_image_page(width, height, width, height, entries, data)
+        writer.close()
+    return data
+
+@pytest.mark.parametrize("mode", ['RGB', 'L', 'P'])
+def test_predictor_page_is_rewrapped_losslessly(tmp_path, mode):
+    img = Image.effect_noise((37, 23), 60).convert('RGB')
+    img = img.quantize(16) if mode == 'P' else img.convert(mode)
+    pdf_path = tmp_path / "page.pdf"
+    data = _write_predictor_pdf(pdf_path, img)
+    
+    cbz_path = tmp_path / "page.cbz"
+    assert PDFtoCBZConverter().convert(str(pdf_path), str(cbz_path))
+    
+    with zipfile.ZipFile(cbz_path) as zip_ref:
+        assert zip_ref.namelist() == ["0001.png"]
+        png = zip_ref.read("0001.png")
+    assert data in png
+    back = Image.open(io.BytesIO(png))
+    assert back.mode == mode
+    assert back.convert('RGB').tobytes() == img.convert('RGB').tobytes()
+
+def test_predictor_page_is_decoded_when_it_cannot_be_rewrapped(tmp_path):
+    # A /Decode array rules out rewrapping, so the predictor is undone here
+    img = Image.effect_noise((37, 23), 60).convert('RGB')
+    pdf_path = tmp_path / "page.pdf"
+    _write_predictor_pdf(pdf_path, img, b" /Decode [0 1 0 1 0 1]")
+    
+    cbz_path = tmp_path / "page.cbz"
+    assert PDFtoCBZConverter().convert(str(pdf_path), str(cbz_path))
+    
+    with zipfile.ZipFile(cbz_path) as zip_ref:
+        back = Image.open(io.BytesIO(zip_ref.read("0001.png")))
+    assert back.convert('RGB').tobytes() == img.tobytes()
@@ -0,0 +1,73 @@
+import os
+import sys
+import hashlib
+import json
+import time
+import subprocess
+
+from conftest import CONVERTER_SCRIPT
+
+def _start_worker(tmp_path, input_files, worker_id):
+    """Start a converter.py worker process against the shared queue."""
+    cmd = [sys.executable, CONVERTER_SCRIPT, 'worker', *input_files,
+           '-q', str(tmp_path / 'queue'), '-o', str(tmp_path / 'out'),
+           '--worker-id', worker_id, '--lease-ttl', '2', '--heartbeat', '0.5']
+    return subprocess.Popen(cmd, cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def _leases_held_by(leases_dir, worker_id):
+    """Return the input paths of the leases a worker holds."""
+    held = []
+    for name in os.listdir(leases_dir):
+        if not name.endswith('.lease'):
+            continue
+        try:
+            with open(os.path.join(leases_dir, name), encoding='utf-8') as f:
+                lease = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if lease['worker_id'] == worker_id:
+            held.append(lease['input_path'])
+    return held
+
+def test_killed_worker_job_is_reclaimed(tmp_path, make_cbz):
+    input_files = [make_cbz(tmp_path / f"book{index}.cbz", pages=6, image_format='PNG', size=(600, 800))
+                   for index in range(8)]
+    leases_dir = tmp_path / 'queue' / 'leases'
+    
+    workers = {worker_id: _start_worker(tmp_path, input_files, worker_id)
+               for worker_id in ('w1', 'w2', 'w3')}
+    try:
+        # Kill w1 while it holds a lease
+        deadline = time.monotonic() + 60
+        while not (leases_dir.exists() and _leases_held_by(leases_dir, 'w1')):
+            assert time.monotonic() < deadline, "w1 never claimed a job"
+            time.sleep(0.01)
+        workers['w1'].kill()
+        workers['w1'].wait()
+        orphaned = _leases_held_by(leases_dir, 'w1')
+        assert orphaned
+        
+        # What w1 would have left if it had died while writing the PDF
+        for input_file in orphaned:
+            job_id = hashlib.sha1(input_file.encode('utf-8')).hexdigest()
+            (tmp_path / 'out' / f".{job_id}.w1.tmp.0123456789ab.part").write_bytes(b'partial')
+        
+        for worker_id in ('w2', 'w3'):
+            assert workers[worker_id].wait(timeout=120) == 0
+    finally:
+        for process in workers.values():
+            if process.poll() is None:
+                process.kill()
+    
+    out_files = sorted(os.listdir(tmp_path / 'out'))
+    assert out_files == sorted(os.path.splitext(os.path.basename(f))[0] + '.pdf' for f in input_files)
+    assert os.listdir(leases_dir) == []
+    
+    done_dir = tmp_path / 'queue' / 'done'
+    assert len(os.listdir(done_dir)) == len(input_files)
+    for name in os.listdir(done_dir):
+        with open(done_dir / name, encoding='utf-8') as f:
+            done = json.load(f)
+        assert done['success']
+        if done['input_path'] in orphaned:
+            assert done['worker_id'] in ('w2', 'w3')